@@ -1,4 +1,5 @@
 import socket
+from signal import signal, SIGUSR1, SIGUSR2
 from sys import path, argv
 from os.path import dirname
 
@@ -20,6 +21,8 @@ from .alsamixer import AlsaMixer
 from .fireface import FireFace
 from .osc import OSC
 from .tray import Tray
+from .simulator import Simulator
+from .trace import tracer
 
 engine_port = config.engine_port
 # engine port can't be random with autorestart
@@ -46,7 +49,16 @@ if not config.dev:
 engine = Engine('FirefaceControl', port=engine_port, folder='~/.config/fireface-control/', debug=config.debug)
 
 settings = Settings('Settings')
-alsamixer = AlsaMixer('AlsaMixer')
+simulator = None
+if config.simulate:
+    simulator = Simulator(config.simulate)
+    signal(SIGUSR1, lambda signum, frame: simulator.toggle())
+
+if config.trace:
+    tracer.start()
+signal(SIGUSR2, lambda signum, frame: tracer.dump_async())
+
+alsamixer = AlsaMixer('AlsaMixer', simulator=simulator)
 fireface = FireFace(alsamixer=alsamixer)
 osc = OSC(protocol='osc', fireface=fireface, port=webapp_port)
 tray = Tray(port=None)
@@ -0,0 +1,429 @@
+"""
+Alsa control backends used by AlsaMixer:
+    - HctlBackend: talks to the control device in-process (python3-pyalsa)
+    - AmixerBackend: amixer subprocesses (fallback)
+"""
+
+from subprocess import Popen, PIPE, run, DEVNULL
+from threading import RLock, Thread
+from signal import SIGINT
+from array import array
+import logging
+import select
+import os
+
+from .stats import stats
+
+try:
+    from pyalsa import alsahcontrol
+except ImportError:
+    alsahcontrol = None
+
+logger = logging.getLogger('AlsaBackend')
+
+# missing elements already reported by get_many()
+reported_missing = set()
+
+
+def parse_lookup(lookup):
+    """
+    Parse an amixer style lookup string (iface=MIXER,name="x",index=1)
+    into a (iface, name, index) tuple
+    """
+    data = {'iface': 'MIXER', 'name': '', 'index': 0}
+    for item in lookup.split(','):
+        key, value = item.split('=', 1)
+        data[key] = value.strip('"\'')
+    return (data['iface'], data['name'], int(data['index']))
+
+
+def normalize_values(value):
+    """
+    Convert a parameter value (scalar or list) to a list of ints
+    """
+    if type(value) not in (list, tuple):
+        value = [value]
+    return [int(v) for v in value]
+
+
+def fit_values(values, lookup, count=None):
+    """
+    Values of an element read by get_many(): padded with zeros / truncated to count if provided.
+    Missing elements (no values) are reported once.
+    """
+    if not values and lookup not in reported_missing:
+        reported_missing.add(lookup)
+        logger.warning(f'could not read element {lookup}' + (', reading zeros instead' if count else ''))
+    if count is None:
+        return values
+    values = list(values)[:count]
+    return values + [0] * (count - len(values))
+
+
+def create_backend(kind, card):
+    """
+    Create alsa backend instance:
+        - 'hctl': in-process control device access
+        - 'amixer': amixer subprocesses
+        - 'auto': hctl if pyalsa is available, amixer otherwise
+    """
+    if kind == 'hctl' or (kind == 'auto' and alsahcontrol is not None):
+        return HctlBackend(card)
+    return AmixerBackend(card)
+
+
+class ControlEventReader(Thread):
+    """
+    Parse 'amixer events' output and call back with the keys of changed elements.
+    Any text stream using the same format can be used (eg a pipe fed with fake events).
+    """
+
+    def __init__(self, stream, callback):
+
+        super().__init__(daemon=True)
+
+        self.stream = stream
+        self.callback = callback
+
+    def run(self):
+
+        for line in self.stream:
+            if line.startswith('event value: '):
+                self.callback(parse_lookup(line[len('event value: '):].strip()))
+
+
+class AmixerBackend():
+    """
+    Alsa backend using amixer:
+        - an interactive amixer instance for writes
+        - an amixer instance per read (cget is not supported in interactive mode)
+    """
+
+    name = 'amixer'
+
+    def __init__(self, card):
+
+        self.card = card
+        self.process = None
+        self.events_process = None
+
+    def open(self):
+        """
+        Start interactive amixer process
+        """
+        self.process = Popen(['amixer', '-c', self.card, '-s', '-q'], stdin=PIPE, text=True)
+        stats.count('subprocess.amixer')
+
+    def close(self):
+        """
+        Stop amixer processes
+        """
+        if self.process:
+            self.process.send_signal(SIGINT)
+            self.process = None
+        if self.events_process:
+            self.events_process.send_signal(SIGINT)
+            self.events_process = None
+
+    def listen(self, lookups, callback):
+        """
+        Subscribe to element value changes using an 'amixer events' instance,
+        callback is called with the key of changed elements (all elements are reported)
+        """
+        self.events_process = Popen(['amixer', '-c', self.card, 'events'], stdout=PIPE, stderr=DEVNULL, text=True)
+        stats.count('subprocess.amixer')
+        ControlEventReader(self.events_process.stdout, callback).start()
+
+    def set(self, lookup, value):
+        """
+        Write values to an element
+        """
+        if not self.process:
+            return
+
+        if type(value) is list:
+            value = ",".join([str(x) for x in value])
+        if type(value) is not str:
+            value = str(value)
+
+        self.process.stdin.write('cset ' + lookup + ' ' + value + '\n')
+        self.process.stdin.flush()
+
+    def get(self, lookup):
+        """
+        Read values from an element
+        """
+        out = run(['amixer', '-c', self.card, 'cget', lookup], stdout=PIPE, stderr=DEVNULL).stdout.decode('utf-8')
+        stats.count('subprocess.amixer')
+        for line in out.split('\n'):
+            if ': values=' in line:
+                return self.parse_values(line.split('=')[1])
+
+        return []
+
+    def get_many(self, lookups, counts=None):
+        """
+        Read values from multiple elements, returns a contiguous integer buffer
+        (counts: expected number of values per element, missing values are zeros).
+        One amixer instance per element: amixer -s doesn't accept cget,
+        and dumping the whole card with 'amixer contents' costs more.
+        """
+        buffer = array('i')
+        for i, lookup in enumerate(lookups):
+            buffer.extend(fit_values(self.get(lookup), lookup, counts[i] if counts else None))
+        return buffer
+
+    def contents(self):
+        """
+        Read all elements: {(iface, name, index): values}
+        """
+        out = run(['amixer', '-c', self.card, 'contents'], stdout=PIPE, stderr=DEVNULL).stdout.decode('utf-8')
+        stats.count('subprocess.amixer')
+        contents = {}
+        key = None
+        for line in out.split('\n'):
+            if line.startswith('numid='):
+                key = parse_lookup(line.split(',', 1)[1])
+            elif ': values=' in line and key is not None:
+                contents[key] = self.parse_values(line.split('=')[1])
+                key = None
+        return contents
+
+    def parse_values(self, values_str):
+        """
+        Parse amixer's value list
+        """
+        values = []
+        for v in values_str.split(','):
+            try:
+                # Try to convert to int first
+                values.append(int(v))
+            except ValueError:
+                # If that fails, try to convert to on/off
+                if v == 'off':
+                    values.append(0)
+                elif v == 'on':
+                    values.append(1)
+                else:
+                    # If all conversions fail, append 0 as a fallback
+                    values.append(0)
+        return values
+
+
+class HctlBackend():
+    """
+    Alsa backend using the control device directly (alsa hcontrol api).
+    Element handles are kept open and addressed by numid,
+    values are read and written as typed integer arrays.
+    """
+
+    name = 'hctl'
+
+    def __init__(self, card):
+
+        if alsahcontrol is None:
+            raise ImportError('pyalsa is not available')
+
+        self.card = card
+        self.hctl = None
+        self.lock = RLock()
+        self.numids = {}
+        self.elements = {}
+        self.missing = set()
+        self.lookups = {}
+        self.events = []
+        self.event_lookups = []
+        self.event_callback = None
+        self.event_pipe = None
+
+    def open(self):
+        """
+        Open control device and list its elements
+        """
+        with self.lock:
+            self.stop_events()
+            self.hctl = alsahcontrol.HControl(name=f'hw:{self.card}', mode=alsahcontrol.open_mode['NONBLOCK'])
+            self.numids = {}
+            self.elements = {}
+            self.missing = set()
+            for numid, iface, device, subdevice, name, index in self.hctl.list():
+                self.numids[(alsahcontrol.interface_name[iface], name, index)] = numid
+            if self.event_callback:
+                # device reopened while listening
+                self.start_events()
+
+    def close(self):
+        """
+        Release element handles and control device
+        """
+        with self.lock:
+            self.stop_events()
+            self.event_callback = None
+            self.elements = {}
+            self.numids = {}
+            self.missing = set()
+            self.hctl = None
+
+    def listen(self, lookups, callback):
+        """
+        Subscribe to element value changes,
+        callback is called with the key of changed elements
+        """
+        with self.lock:
+            self.event_lookups = lookups
+            self.event_callback = callback
+            self.start_events()
+
+    def start_events(self):
+        """
+        Register element callbacks and start event thread
+        """
+        if self.hctl is None:
+            return
+        for lookup in self.event_lookups:
+            key = self.key(lookup)
+            if key in self.numids:
+                handle = self.element(lookup)
+                handle[0].set_callback(lambda element, mask, key=key: self.element_event(key, mask))
+        if self.event_pipe is None:
+            self.event_pipe = os.pipe()
+            Thread(target=self.handle_events, args=[self.hctl, self.event_pipe], daemon=True).start()
+
+    def stop_events(self):
+        """
+        Wake up and stop event thread
+        """
+        if self.event_pipe:
+            os.write(self.event_pipe[1], b'\0')
+            self.event_pipe = None
+
+    def element_event(self, key, mask):
+        """
+        Element callback, called from hctl.handle_events()
+        """
+        if mask & alsahcontrol.event_mask['VALUE']:
+            self.events.append(key)
+
+    def handle_events(self, hctl, event_pipe):
+        """
+        Event thread: wait for control device events (no timeout, zero cpu when idle).
+        Callbacks are called outside of the backend's lock.
+        """
+        poller = select.poll()
+        for fd, mask in hctl.poll_fds:
+            poller.register(fd, mask)
+        poller.register(event_pipe[0], select.POLLIN)
+
+        while True:
+            ready = poller.poll()
+            if any([fd == event_pipe[0] for fd, mask in ready]):
+                break
+            with self.lock:
+                if self.hctl is not hctl:
+                    break
+                self.events = []
+                hctl.handle_events()
+                events = self.events
+                callback = self.event_callback
+            for key in events:
+                callback(key)
+
+        os.close(event_pipe[0])
+        os.close(event_pipe[1])
+
+    def key(self, lookup):
+        """
+        Get element key from lookup string (cached)
+        """
+        if lookup not in self.lookups:
+            self.lookups[lookup] = parse_lookup(lookup)
+        return self.lookups[lookup]
+
+    def element(self, lookup):
+        """
+        Get element handle: (element, type, count, value) or None if it doesn't exist
+        """
+        key = self.key(lookup)
+
+        if key in self.elements:
+            return self.elements[key]
+
+        if key in self.missing:
+            return None
+
+        if key not in self.numids:
+            # elements created by snd-fireface-ctl-service after the device was opened
+            # are only listed when reopening it
+            self.open()
+            if key not in self.numids:
+                self.missing.add(key)
+                return None
+
+        element = alsahcontrol.Element(self.hctl, self.numids[key])
+        info = alsahcontrol.Info(element)
+        self.elements[key] = (element, info.type, info.count, alsahcontrol.Value(element))
+
+        return self.elements[key]
+
+    def set(self, lookup, value):
+        """
+        Write values to an element
+        """
+        with self.lock:
+            if self.hctl is None:
+                return
+            handle = self.element(lookup)
+            if handle is None:
+                return
+            element, elem_type, count, data = handle
+            data.set_tuple(elem_type, tuple(normalize_values(value))[:count])
+            data.write()
+
+    def get(self, lookup):
+        """
+        Read values from an element
+        """
+        with self.lock:
+            if self.hctl is None:
+                return []
+            handle = self.element(lookup)
+            if handle is None:
+                return []
+            element, elem_type, count, data = handle
+            data.read()
+            return [int(v) for v in data.get_tuple(elem_type, count)]
+
+    def contents(self):
+        """
+        Read all elements: {(iface, name, index): values}
+        """
+        contents = {}
+        with self.lock:
+            if self.hctl is None:
+                return contents
+            for key, numid in self.numids.items():
+                iface, name, index = key
+                values = self.get(f'iface={iface},name="{name}",index={index}')
+                if values:
+                    contents[key] = values
+        return contents
+
+    def get_many(self, lookups, counts=None):
+        """
+        Read values from multiple elements in one pass,
+        returns a contiguous integer buffer
+        (counts: expected number of values per element, missing values are zeros)
+        """
+        buffer = array('i')
+        with self.lock:
+            if self.hctl is None:
+                return buffer
+            for i, lookup in enumerate(lookups):
+                values = ()
+                handle = self.element(lookup)
+                if handle is not None:
+                    element, elem_type, count, data = handle
+                    data.read()
+                    values = data.get_tuple(elem_type, count)
+                buffer.extend(fit_values(values, lookup, counts[i] if counts else None))
+        return buffer
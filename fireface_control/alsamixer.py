@@ -1,105 +1,225 @@
 from subprocess import Popen, PIPE, run, check_output, DEVNULL
-from threading import RLock
-from time import sleep
-from signal import SIGINT
+from threading import RLock, Lock, Thread, Condition
+from time import sleep, monotonic, perf_counter
 from queue import Queue
+from collections import deque
+from array import array
+from concurrent.futures import Future
 
 from mentat import Module
 
+from .config import config
+from .alsabackend import create_backend, parse_lookup, normalize_values
+from .presence import CardPresence, read_status
+from .stats import stats
+from .trace import tracer
+from .supervisor import ServiceSupervisor
+
+# readiness check delays after the service (re)started, doubled after each failed attempt (seconds)
+READY_MIN_DELAY = 0.01
+READY_MAX_DELAY = 0.2
+# service is restarted if not ready in time
+READY_TIMEOUT = 10
+
 class AlsaMixer(Module):
 
-        def __init__(self, *args, **kwargs):
+        def __init__(self, *args, procfs='/proc/asound', devfs='/dev/snd', simulator=None, **kwargs):
 
             super().__init__(*args, **kwargs)
 
-            self.snd_process = None
-            self.alsaset_process = None
+            self.backend = None
+            self.procfs = procfs
+            self.devfs = devfs
+
+            # simulated interface (see simulator.py): replaces procfs, devfs,
+            # snd-fireface-ctl-service and the alsa backend
+            self.simulator = simulator
+            if self.simulator:
+                self.procfs = self.simulator.procfs
+                self.devfs = self.simulator.devfs
+                self.simulator.plug()
+                self.logger.info(f'simulating Fireface {self.simulator.model} in {self.simulator.root}')
+
+            # elements subscribed to change events: {key: lookup}
+            self.watched = {}
+
+            # device io runs in a dedicated thread (see worker()), the engine only queues work:
+            # write queue: latest value per element, flushed at most once per write interval
+            # pending: sealed write batches and command sequences, in submission order
+            # requests: (future, function, args) calls (reads, backend and process management)
+            self.write_queue = {}
+            self.write_pending = deque()
+            self.requests = deque()
+            self.io_condition = Condition()
+            self.write_interval = config.alsa_write_interval / 1000
+            self.write_stats = {'submitted': 0, 'written': 0, 'skipped': 0}
+            Thread(target=self.worker, name='alsa-io', daemon=True).start()
+
+            # shadow copy of the device's control values: {key: values}
+            # (written by the io thread and the engine, guarded by shadow_lock)
+            self.shadow = {}
+            self.shadow_keys = {}
+            self.shadow_lock = Lock()
 
             self.add_parameter('card-online', None, types='i', default=0)
             self.add_parameter('card-model', None, types='s', default='')
 
             self.waking_up = False
 
+            # snd-fireface-ctl-service, restarted if it exits while the interface is connected
+            self.supervisor = ServiceSupervisor(
+                'snd-fireface-ctl-service',
+                self.spawn_service,
+                on_start=self.service_started,
+                on_exit=self.service_exited,
+                logger=self.logger
+            )
+
             for model in ['802', 'UCX']:
-                try:
-                    status = check_output(['cat', f'/proc/asound/Fireface{model}/firewire/status'], text=True, stderr=DEVNULL)
-                    if status:
-                        self.set('card-model', model)
-                except:
-                    pass
+                if read_status(f'{self.procfs}/Fireface{model}/firewire/status'):
+                    self.set('card-model', model)
 
             if not self.get('card-model'):
                 self.set('card-model', '802')
                 self.logger.warning(f'Fireface interface not found, falling back to offline Fireface {self.get('card-model')}')
 
+            self.presence = CardPresence(
+                f'{self.procfs}/Fireface{self.get('card-model')}/firewire/status',
+                self.presence_changed,
+                watch=[self.devfs],
+                watch_status=[self.procfs]
+            )
             self.start_scene('status_check', self.status_check)
 
             self.add_event_callback('parameter_changed', self.parameter_changed)
             self.engine.add_event_callback('stopping', self.stop)
+            self.engine.add_event_callback('stopping', self.presence.stop)
+
+            stats.register('alsa', self.alsa_write_stats)
+            stats.register('service', self.supervisor.snapshot)
+            if self.simulator:
+                stats.register('simulator', lambda: dict(self.simulator.stats))
+                self.engine.add_event_callback('stopping', self.simulator.cleanup)
 
         def status_check(self):
             """
-            Detect interface connection status
+            Detect interface connection status,
+            subsequent changes are reported by presence events
             """
-            while True:
-                if self.waking_up:
-                    continue
-                try:
-                    status = check_output(['cat', f'/proc/asound/Fireface{self.get('card-model')}/firewire/status'], text=True, stderr=DEVNULL)
-                    if status and not self.get('card-online'):
-                        self.logger.info(f'Fireface {self.get('card-model')} found')
-                        self.start_alsaset_process()
-                except:
-                    if self.get('card-online'):
-                        self.logger.warning(f'Fireface disconnected, falling back to offline mode')
-                        self.stop()
-                        self.set('card-online', 0)
+            self.presence.start()
 
-                self.wait(1, 's')
+        def presence_changed(self, online):
+            """
+            Interface connection status changed,
+            processes and backend are started / stopped by the io thread
+            """
+            with stats.lock(self.engine.lock()):
+                if online and not self.get('card-online') and not self.waking_up:
+                    self.logger.info(f'Fireface {self.get('card-model')} found')
+                    self.waking_up = True
+                    self.submit(self.start_alsaset_process)
+                elif not online and (self.get('card-online') or self.waking_up):
+                    self.logger.warning(f'Fireface disconnected, falling back to offline mode')
+                    self.stop_scene('wake_up')
+                    self.waking_up = False
+                    self.set('card-online', 0)
+                    self.submit(self.stop)
 
-        def start_snd_process(self):
+        def spawn_service(self):
             """
-            Start snd-fireface-ctl-service
+            Start snd-fireface-ctl-service (supervisor callback), return its process
             """
-            cards = check_output(['cat', f'/proc/asound/cards'], text=True)
+            cards = read_status(f'{self.procfs}/cards')
             for line in cards.split('\n'):
                 if f'Fireface{self.get('card-model')}' in line:
                     card_number = line.split('[')[0].strip()
-                    try:
-                        self.snd_process = Popen(['snd-fireface-ctl-service', card_number], text=True)
-                        self.logger.info('snd-firewire-ctl-services started')
-                    except Exception as e:
-                        self.logger.warning(f'error while starting snd-firewire-ctl-services ({e})')
-                    break
+                    if self.simulator:
+                        return self.simulator.spawn_service(card_number)
+                    stats.count('subprocess.snd-fireface-ctl-service')
+                    return Popen(['snd-fireface-ctl-service', card_number], text=True)
+
+            raise OSError(f'Fireface{self.get('card-model')} not found in {self.procfs}/cards')
 
         def start_alsaset_process(self):
             """
-            Start amixer process
+            Start supervising snd-fireface-ctl-service,
+            the alsa backend is opened once it's ready (see wake_up)
             """
             self.stop()
-            try:
-                self.start_snd_process()
-                self.start_scene('wake_up', self.wake_up)
-            except Exception as e:
-                self.logger.warning(f'could not start amixer process\n{e}')
+            self.supervisor.start()
+
+        def service_started(self):
+            """
+            snd-fireface-ctl-service (re)started: wait until it's ready
+            """
+            self.waking_up = True
+            self.start_scene('wake_up', self.wake_up)
+
+        def service_exited(self, returncode):
+            """
+            snd-fireface-ctl-service exited unexpectedly: fall back to offline mode
+            until the supervisor has restarted it
+            """
+            if self.simulator:
+                self.simulator.stop_service()
+            with stats.lock(self.engine.lock()):
+                self.stop_scene('wake_up')
+                if self.get('card-online'):
+                    self.logger.warning(f'snd-fireface-ctl-service stopped, falling back to offline mode')
+                    self.set('card-online', 0)
+            self.submit(self.close_backend)
 
         def wake_up(self):
             """
             snd-firewire-ctl-services takes some time to take over the interface
-            we must wait a little before pushing any value
+            we must wait until the control device responds before pushing any value
+            (retried with increasing delays, the service is restarted if it takes too long)
             """
             self.waking_up = True
 
-            while True:
+            delay = READY_MIN_DELAY
+            timeout = monotonic() + READY_TIMEOUT
+            while not self.submit(self.open_backend).result():
+                if monotonic() > timeout:
+                    self.logger.warning(f'snd-fireface-ctl-service not ready after {READY_TIMEOUT}s, restarting it')
+                    self.supervisor.restart()
+                    return
+                self.wait(delay, 's')
+                delay = min(delay * 2, READY_MAX_DELAY)
+
+            self.supervisor.ready()
+            self.set('card-online', 1)
+
+        def open_backend(self):
+            """
+            Open alsa backend if snd-firewire-ctl-services is ready (io thread),
+            return True on success
+            """
+            if self.simulator:
+                backend = self.simulator.backend()
+            else:
+                backend = create_backend(config.alsa_backend, f'Fireface{self.get('card-model')}')
+
+            try:
+                backend.open()
+                if not backend.get('iface=CARD,name=\'active-clock-rate\''):
+                    backend.close()
+                    return False
+                backend.listen(list(self.watched.values()), self.control_changed)
+                self.seed_shadow(backend)
+            except Exception as e:
+                # not ready yet (or failed halfway): retried by wake_up
+                self.logger.debug(f'could not open {backend.name} alsa backend ({e})')
                 try:
-                    test = check_output(['amixer', '-c', f'Fireface{self.get('card-model')}', 'cget', 'iface=CARD,name=\'active-clock-rate\'' ], text=True, stderr=DEVNULL)
-                    break
-                except:
-                    self.wait(0.1, 's')
+                    backend.close()
+                except Exception:
+                    pass
+                return False
 
-            self.alsaset_process = Popen(['amixer', '-c', f'Fireface{self.get('card-model')}', '-s', '-q'], stdin=PIPE, text=True)
+            self.backend = backend
+            self.logger.info(f'using {backend.name} alsa backend')
 
-            self.set('card-online', 1)
+            return True
 
 
         def parameter_changed(self, mod, name, value):
@@ -110,65 +230,260 @@ class AlsaMixer(Module):
             if name == 'card-online' and value == 1:
                 self.waking_up = False
 
-        def alsa_set(self, alsa_lookup, value):
+        def watch(self, alsa_lookups):
+            """
+            Subscribe to value change events for given elements,
+            changes are dispatched with the control_changed event
+            """
+            for lookup in alsa_lookups:
+                self.watched[parse_lookup(lookup)] = lookup
+
+        def control_changed(self, key):
+            """
+            Alsa control event callback (called from the backend's event thread)
+            """
+            if key in self.watched:
+                self.dispatch_event('control_changed', self.watched[key])
+
+        def shadow_key(self, alsa_lookup):
+            """
+            Get element key from lookup string (cached)
+            """
+            if alsa_lookup not in self.shadow_keys:
+                self.shadow_keys[alsa_lookup] = parse_lookup(alsa_lookup)
+            return self.shadow_keys[alsa_lookup]
+
+        def seed_shadow(self, backend):
+            """
+            Read back all elements to initialize the shadow copy
+            """
+            shadow = {key: tuple(values) for key, values in backend.contents().items()}
+            with self.shadow_lock:
+                self.shadow = shadow
+            self.logger.debug(f'device state cache seeded with {len(self.shadow)} elements')
+
+        def invalidate_shadow(self):
+            """
+            Forget cached device state (eg when the driver restarts)
+            """
+            with self.shadow_lock:
+                self.shadow = {}
+
+        def shadow_matches(self, alsa_lookup, value):
+            """
+            Check if the device already holds given value
             """
-            Alsa mixer set function, uses an interactive amixer instance
+            try:
+                values = tuple(normalize_values(value))
+            except (TypeError, ValueError):
+                return False
+            with self.shadow_lock:
+                cached = self.shadow.get(self.shadow_key(alsa_lookup))
+                if cached is None or cached[:len(values)] != values:
+                    return False
+                # callers run in several threads
+                self.write_stats['skipped'] += 1
+            return True
+
+        def update_shadow(self, alsa_lookup, value):
             """
-            if self.get('card-online') and self.alsaset_process:
+            Store value in the shadow copy
+            """
+            key = self.shadow_key(alsa_lookup)
+            try:
+                values = tuple(normalize_values(value))
+            except (TypeError, ValueError):
+                values = None
+            with self.shadow_lock:
+                if values is None:
+                    self.shadow.pop(key, None)
+                else:
+                    cached = self.shadow.get(key, ())
+                    self.shadow[key] = values + cached[len(values):]
 
+        def alsa_set(self, alsa_lookup, value):
+            """
+            Alsa mixer set function: queue value for the io thread.
+            Successive writes to the same element are coalesced (latest value wins).
+            """
+            if self.get('card-online') and self.backend:
+                tracer.instant('alsa_set', 'alsa', lookup=alsa_lookup)
                 if type(value) is list:
-                    value = ",".join([str(x) for x in value])
-                if type(value) is not str:
-                    value = str(value)
+                    value = list(value)
+                self.update_shadow(alsa_lookup, value)
+                with self.io_condition:
+                    self.write_queue[alsa_lookup] = value
+                    self.write_stats['submitted'] += 1
+                    self.io_condition.notify()
 
-                self.alsaset_process.stdin.write('cset ' + alsa_lookup + ' ' + value + '\n')
-                self.alsaset_process.stdin.flush()
+        def alsa_sequence(self, steps):
+            """
+            Schedule an ordered command sequence, run by the io thread.
+            steps: list of (alsa_lookup, value) writes and delays (numbers, in seconds)
+            Writes submitted before the sequence are flushed before it,
+            writes submitted after are flushed after it.
+            """
+            if self.get('card-online') and self.backend:
+                for step in steps:
+                    if type(step) is tuple:
+                        self.update_shadow(*step)
+                with self.io_condition:
+                    if self.write_queue:
+                        self.write_pending.append(self.write_queue)
+                        self.write_queue = {}
+                    self.write_pending.append(steps)
+                    self.write_stats['submitted'] += len([s for s in steps if type(s) is tuple])
+                    self.io_condition.notify()
 
-        def alsa_get(self, alsa_lookup):
+        def submit(self, function, *args):
             """
-            Alsa mixer get function, uses an amixer instance per call
-            because it doesn't work with a interactive instance (cget is not supported)
+            Run function(*args) in the io thread, return a Future holding its result.
+            Requests don't wait for pending writes.
             """
-            if not self.get('card-online'):
-                return []
+            future = Future()
+            with self.io_condition:
+                self.requests.append((future, function, args))
+                self.io_condition.notify()
+            return future
 
-            out = run(['amixer', '-c', f'Fireface{self.get('card-model')}', 'cget', alsa_lookup], stdout=PIPE, stderr=DEVNULL).stdout.decode('utf-8')
-            for line in out.split('\n'):
-                if ': values=' in line:
-                    values_str = line.split('=')[1]
-                    values = []
-                    for v in values_str.split(','):
-                        try:
-                            # Try to convert to int first
-                            values.append(int(v))
-                        except ValueError:
-                            # If that fails, try to convert to on/off
-                            if v == 'off':
-                                values.append(0)
-                            elif v == 'on':
-                                values.append(1)
+        def worker(self):
+            """
+            Io thread: run requests as they come, flush the write queue
+            at most once per write interval and run command sequences
+            """
+            last_flush = 0
+            while True:
+                with self.io_condition:
+                    while not self.requests and not self.write_queue and not self.write_pending:
+                        self.io_condition.wait()
+                    requests = list(self.requests)
+                    self.requests.clear()
+
+                if requests:
+                    for future, function, args in requests:
+                        if future.set_running_or_notify_cancel():
+                            try:
+                                future.set_result(function(*args))
+                            except Exception as e:
+                                future.set_exception(e)
+                    continue
+
+                # let writes from the same engine cycle accumulate (requests are run meanwhile)
+                delay = last_flush + self.write_interval - monotonic()
+                if delay > 0:
+                    with self.io_condition:
+                        if self.io_condition.wait_for(lambda: self.requests, delay):
+                            continue
+
+                with self.io_condition:
+                    items = list(self.write_pending)
+                    if self.write_queue:
+                        items.append(self.write_queue)
+                    self.write_pending.clear()
+                    self.write_queue = {}
+
+                for item in items:
+                    if type(item) is dict:
+                        self.write(item.items())
+                    else:
+                        for step in item:
+                            if type(step) is tuple:
+                                self.write([step])
                             else:
-                                # If all conversions fail, append 0 as a fallback
-                                values.append(0)
-                    return values
+                                sleep(step)
+
+                last_flush = monotonic()
 
-            return []
+        def write(self, writes):
+            """
+            Write (alsa_lookup, value) pairs to the device
+            """
+            backend = self.backend
+            if backend:
+                for lookup, value in writes:
+                    t = perf_counter()
+                    backend.set(lookup, value)
+                    end = perf_counter()
+                    stats.observe('alsa.write', end - t)
+                    if tracer.enabled:
+                        tracer.complete('write', 'alsa', t, end, lookup=lookup)
+                    self.write_stats['written'] += 1
 
+        def alsa_write_stats(self):
+            """
+            Number of writes submitted / actually written to the device
+            """
+            return dict(self.write_stats)
+
+        def alsa_get_async(self, alsa_lookup):
+            """
+            Read element values in the io thread, return a Future
+            """
+            return self.submit(self.read, alsa_lookup)
+
+        def alsa_get(self, alsa_lookup, timeout=None):
+            """
+            Alsa mixer get function: blocks until the io thread has read the element,
+            must not be called from the engine's thread (use alsa_get_async)
+            """
+            return self.alsa_get_async(alsa_lookup).result(timeout)
+
+        def alsa_get_many(self, alsa_lookups, counts=None, timeout=None):
+            """
+            Alsa mixer get function for multiple elements,
+            values are read in one operation and returned as a contiguous integer buffer
+            (counts: expected number of values per element, missing values are read as zeros)
+            (blocking, see alsa_get)
+            """
+            return self.submit(self.read_many, alsa_lookups, counts).result(timeout)
+
+        def read(self, alsa_lookup):
+            """
+            Read element values (io thread)
+            """
+            if not self.get('card-online') or not self.backend:
+                return []
+
+            with stats.timed('alsa.read'):
+                values = self.backend.get(alsa_lookup)
+            if values:
+                with self.shadow_lock:
+                    self.shadow[self.shadow_key(alsa_lookup)] = tuple(values)
+
+            return values
+
+        def read_many(self, alsa_lookups, counts=None):
+            """
+            Read multiple elements (io thread)
+            """
+            if not self.get('card-online') or not self.backend:
+                return array('i')
+
+            with stats.timed('alsa.read-many'):
+                return self.backend.get_many(alsa_lookups, counts)
+
+
+        def close_backend(self):
+            """
+            Close alsa backend and drop pending writes (io thread)
+            """
+            if self.backend:
+                self.backend.close()
+                self.backend = None
+            with self.io_condition:
+                self.write_queue = {}
+                self.write_pending.clear()
+            self.invalidate_shadow()
 
         def stop(self):
             """
-            Kill alsa processes when stopping
+            Close alsa backend and stop snd-fireface-ctl-service
             Note: kill() / terminate() does not quit snd-fireface-ctl-service properly
             and leaves some things locked, only SIGINT works
             """
-            if self.alsaset_process:
-                self.alsaset_process.send_signal(SIGINT)
-                self.alsaset_process = None
-            if self.snd_process:
-                if self.engine.is_stopping and not self.engine.is_restarting:
-                    # do nothing, let the process die with main process
-                    # otherwise it locks somehow
-                    pass
-                else:
-                    self.snd_process.send_signal(SIGINT)
-                    self.snd_process = None
+            self.close_backend()
+            # when the engine stops (without restarting), let the process die with main process
+            # otherwise it locks somehow
+            self.supervisor.stop(terminate=not self.engine.is_stopping or self.engine.is_restarting)
+            if self.simulator:
+                self.simulator.stop_service()
@@ -0,0 +1,571 @@
+"""
+End-to-end benchmark: runs the application headless against a simulated interface
+and a scripted osc client, reports latencies and message rates as json
+
+    python -m fireface_control.benchmark [--model 802|UCX] [--output file] [application options]
+"""
+
+import os
+import sys
+import json
+import socket
+import shutil
+import tempfile
+from argparse import ArgumentParser
+from subprocess import run
+from threading import Thread, Condition, Event
+from bisect import bisect_left
+from time import perf_counter, sleep
+
+import numpy as np
+
+from . import __version__
+from .oscpacket import encode_message, decode_packet
+
+MODELS = ['802', 'UCX']
+
+parser = ArgumentParser(prog='python -m fireface_control.benchmark', description='Unknown options are passed to the application (eg --alsa-write-interval)')
+parser.add_argument('--model', help='card model layout (all models by default, each in its own process)', choices=MODELS, default=None)
+parser.add_argument('--iterations', help='number of iterations for latency scenarios', type=int, default=200)
+parser.add_argument('--output', help='write json results to file instead of stdout', default=None)
+
+def summary(samples, timeouts=0):
+    """
+    Latency statistics (samples in seconds, results in ms)
+    """
+    if not samples:
+        return {'count': 0, 'timeouts': timeouts}
+    samples = np.array(samples) * 1000
+    return {
+        'count': len(samples),
+        'timeouts': timeouts,
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p99_ms': round(float(np.percentile(samples, 99)), 3),
+        'max_ms': round(float(samples.max()), 3)
+    }
+
+class EventLog():
+    """
+    Timestamped events appended by a thread and waited for by another
+    """
+
+    def __init__(self):
+
+        self.times = []
+        self.items = []
+        self.condition = Condition()
+
+    def append(self, item):
+
+        with self.condition:
+            self.times.append(perf_counter())
+            self.items.append(item)
+            self.condition.notify_all()
+
+    def first(self, since, match=None, timeout=2):
+        """
+        Wait for the first event after since (matching match(item) if given),
+        return its time (None if it times out)
+        """
+        deadline = perf_counter() + timeout
+        with self.condition:
+            index = bisect_left(self.times, since)
+            while True:
+                while index < len(self.items):
+                    if match is None or match(self.items[index]):
+                        return self.times[index]
+                    index += 1
+                remaining = deadline - perf_counter()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def last(self, since, quiet=0.1, timeout=10):
+        """
+        Wait until no event occurs for quiet seconds,
+        return the time of the last event after since (None if there is none)
+        """
+        deadline = perf_counter() + timeout
+        with self.condition:
+            while perf_counter() < deadline:
+                count = len(self.items)
+                self.condition.wait(quiet)
+                if len(self.items) == count:
+                    break
+            index = bisect_left(self.times, since)
+            return self.times[-1] if index < len(self.times) else None
+
+    def count(self, since, until=None, match=None):
+        """
+        Times of events between since and until
+        """
+        with self.condition:
+            start = bisect_left(self.times, since)
+            end = bisect_left(self.times, until) if until is not None else len(self.times)
+            return [t for t, item in zip(self.times[start:end], self.items[start:end]) if match is None or match(item)]
+
+class ScriptedClient():
+    """
+    Osc client standing in for open-stage-control: sends messages to the engine
+    from the osc module's port and records every message it receives
+    """
+
+    def __init__(self):
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.socket.bind(('127.0.0.1', 0))
+        self.port = self.socket.getsockname()[1]
+        self.engine_port = None
+
+        self.messages = EventLog()
+        self.datagrams = 0
+        self.bytes = 0
+
+        Thread(target=self.receive, daemon=True).start()
+
+    def receive(self):
+
+        while True:
+            data = self.socket.recv(1 << 16)
+            self.datagrams += 1
+            self.bytes += len(data)
+            for message in decode_packet(data):
+                self.messages.append(message)
+
+    def send(self, address, *args):
+        """
+        Send a message to the engine, return the time it was sent
+        """
+        t = perf_counter()
+        self.socket.sendto(encode_message(address, *args), ('127.0.0.1', self.engine_port))
+        return t
+
+    def wait_for(self, since, address, args=None, timeout=2):
+        """
+        Wait for a message (with given arguments if provided), return its reception time
+        """
+        return self.messages.first(since, lambda m: m[0] == address and (args is None or m[1] == args), timeout)
+
+class Benchmark():
+    """
+    Application instance (headless) and benchmark scenarios
+    """
+
+    def __init__(self, model, iterations, output):
+
+        # application modules parse the command line when imported,
+        # they're imported once benchmark options have been removed from it
+        from mentat import Engine
+        from .config import config
+        from .settings import Settings
+        from .alsamixer import AlsaMixer
+        from .fireface import FireFace
+        from .osc import OSC
+        from .simulator import Simulator
+
+        self.config = config
+        self.model = model
+        self.iterations = iterations
+        self.output = output
+        self.results = {'model': model, 'version': __version__, 'config': {
+            'alsa_write_interval': config.alsa_write_interval,
+            'meter_rate': config.meter_rate,
+            'meter_transport': config.meter_transport,
+        }}
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('', 0))
+        engine_port = sock.getsockname()[1]
+        sock.close()
+
+        self.folder = tempfile.mkdtemp(prefix='fireface-benchmark-')
+        self.client = ScriptedClient()
+        self.client.engine_port = engine_port
+
+        self.simulator = Simulator(model)
+        self.writes = EventLog()
+        self.simulator.write_callback = lambda key, values: self.writes.append(key)
+
+        self.engine = Engine('FirefaceControl', port=engine_port, folder=self.folder, debug=config.debug)
+        self.settings = Settings('Settings')
+        self.alsamixer = AlsaMixer('AlsaMixer', simulator=self.simulator)
+        self.fireface = FireFace(alsamixer=self.alsamixer)
+        self.osc = OSC(protocol='osc', fireface=self.fireface, port=self.client.port, gui=False)
+
+        for module in [self.settings, self.alsamixer, self.fireface, self.osc]:
+            self.engine.add_module(module)
+
+        self.start_time = None
+        self.engine.add_event_callback('started', self.engine_started)
+
+    def run(self):
+        """
+        Start engine (blocking until the scenarios are done)
+        """
+        self.start_time = perf_counter()
+        self.engine.start()
+
+    def engine_started(self):
+
+        Thread(target=self.scenarios, daemon=True).start()
+
+    def scenarios(self):
+        """
+        Run all scenarios, write results and stop the engine
+        """
+        try:
+            self.cold_start()
+            self.client.send('/gui-clients', 1)
+            for scenario in [self.connect, self.fader_sweep, self.fader_burst, self.matrix_bulk, self.selection, self.client_views, self.state_load, self.meters, self.slow_device, self.card_resync, self.service_recovery]:
+                self.results[scenario.__name__] = scenario()
+                sleep(0.2)
+            self.results['alsa_writes'] = self.alsamixer.alsa_write_stats()
+        except Exception as e:
+            self.results['error'] = repr(e)
+        finally:
+            write_results(self.results, self.output)
+            shutil.rmtree(self.folder, ignore_errors=True)
+            self.engine.stop()
+
+    def cold_start(self):
+        """
+        Engine start to card online (simulated service startup included)
+        """
+        while not self.fireface.get('card-online'):
+            sleep(0.005)
+        self.results['cold_start_ms'] = round((perf_counter() - self.start_time) * 1000, 3)
+        # let initial sync writes settle
+        self.writes.last(0, quiet=0.2)
+
+    def connect(self):
+        """
+        Client (re)connection: /connect to the end of the state push
+        """
+        samples = []
+        timeouts = 0
+        for i in range(10):
+            datagrams, size = self.client.datagrams, self.client.bytes
+            t0 = self.client.send('/connect')
+            t = self.client.messages.first(t0, lambda m: m[0] == '/SCRIPT' and 'state-rendered' in m[1][0], timeout=5)
+            if t is None:
+                timeouts += 1
+                continue
+            samples.append(t - t0)
+            self.client.send('/state-rendered', self.osc.state_push['id'])
+            sleep(0.05)
+
+        result = summary(samples, timeouts)
+        result['datagrams_per_push'] = self.client.datagrams - datagrams
+        result['bytes_per_push'] = self.client.bytes - size
+        return result
+
+    def fader_sweep(self):
+        """
+        Output fader moves, one at a time: osc message to alsa write
+        """
+        n = len(self.fireface.outputs)
+        samples = []
+        timeouts = 0
+        for i in range(self.iterations):
+            t0 = self.client.send(f'/output:volume-db:{i % n}', float(-40 + (i // n) % 40))
+            t = self.writes.first(t0, timeout=1)
+            if t is None:
+                timeouts += 1
+                continue
+            samples.append(t - t0)
+            self.writes.last(t0, quiet=0.005)
+
+        return summary(samples, timeouts)
+
+    def fader_burst(self):
+        """
+        Output fader moves sent back to back: message and write rates
+        """
+        n = len(self.fireface.outputs)
+        count = self.iterations * 5
+        t0 = perf_counter()
+        for i in range(count):
+            self.client.send(f'/output:volume-db:{i % n}', float(-60 + (i // n) % 60))
+        sent = perf_counter()
+        last = self.writes.last(t0, quiet=0.2)
+        elapsed = (last or sent) - t0
+
+        return {
+            'messages': count,
+            'writes': len(self.writes.count(t0)),
+            'elapsed_ms': round(elapsed * 1000, 3),
+            'messages_per_s': round(count / elapsed, 1)
+        }
+
+    def matrix_bulk(self):
+        """
+        Whole monitor matrix edit: first message to last alsa write
+        """
+        samples = []
+        timeouts = 0
+        applied = 0
+        count = len(self.fireface.outputs) * len(self.fireface.inputs)
+        for r in range(5):
+            values = {}
+            t0 = perf_counter()
+            for out_index in range(len(self.fireface.outputs)):
+                for in_index in range(len(self.fireface.inputs)):
+                    name = f'monitor:input-gain:{out_index}:{in_index}'
+                    values[name] = float(-20 - r - (out_index + in_index) % 10)
+                    self.client.send(f'/{name}', values[name])
+            last = self.writes.last(t0, quiet=0.2)
+            # messages may be dropped when the engine can't keep up
+            applied += len([name for name, value in values.items() if self.fireface.get(name) == value])
+            if last is None:
+                timeouts += 1
+                continue
+            samples.append(last - t0)
+
+        result = summary(samples, timeouts)
+        result['messages'] = count
+        result['applied_ratio'] = round(applied / (count * 5), 4)
+        if samples:
+            result['messages_per_s'] = round(count / float(np.median(samples)), 1)
+        return result
+
+    def selection(self):
+        """
+        Input / output selection switches: osc message to selection state received
+        """
+        samples = {'input': [], 'output': []}
+        timeouts = 0
+        for i in range(self.iterations):
+            kind = ['input', 'output'][i % 2]
+            latency = self.select(kind, i // 2 + 1)
+            if latency is None:
+                timeouts += 1
+                continue
+            samples[kind].append(latency)
+            sleep(0.002)
+
+        return {kind: summary(s) for kind, s in samples.items()} | {'timeouts': timeouts}
+
+    def client_views(self, clients=4):
+        """
+        Per client selections (two clients per input): detail parameter change sent by a client
+        to reception by the other client that selected the same input, messages received per client
+        """
+        ids = [f'client-{i}' for i in range(clients)]
+        for i, client_id in enumerate(ids):
+            self.client.send('/gui-client-open', client_id)
+            t0 = self.client.send(f'/_client/{client_id}/input:select', i // 2)
+            self.client.wait_for(t0, f'/_client/{client_id}/input:select', [i // 2])
+
+        samples = []
+        timeouts = 0
+        start = perf_counter()
+        for i in range(self.iterations):
+            value = 20 - i % 2 * 10
+            t0 = self.client.send(f'/_client/{ids[0]}/input:dyn-attack:0', value)
+            t = self.client.wait_for(t0, f'/_client/{ids[1]}/input:dyn-attack:0', [value])
+            if t is None:
+                timeouts += 1
+                continue
+            samples.append(t - t0)
+
+        sleep(0.1)
+        received = {}
+        for client_id in ids:
+            received[client_id] = len(self.client.messages.count(start, match=lambda m: m[0].startswith(f'/_client/{client_id}/')))
+            self.client.send('/gui-client-close', client_id)
+
+        result = summary(samples, timeouts)
+        result['received'] = received
+        return result
+
+    def select(self, kind, channel):
+        """
+        Select a channel, return the osc round trip time (None if it times out)
+        """
+        channel = channel % len(self.fireface.inputs if kind == 'input' else self.fireface.outputs)
+        t0 = self.client.send(f'/{kind}:select', channel)
+        t = self.client.wait_for(t0, f'/{kind}:select', [channel])
+        return t - t0 if t is not None else None
+
+    def slow_device(self, device_latency=0.02):
+        """
+        Stress: osc round trips (selection switches) while faders move and meters run,
+        with a normal device and with a slow one (latency added to every element read / write).
+        Device io runs in alsamixer's io thread: round trips shouldn't depend on device latency.
+        """
+        results = {}
+        self.client.send('/metering', 1)
+        for latency in [0, device_latency]:
+            self.simulator.write_latency = self.simulator.read_latency = latency
+
+            stop = Event()
+            Thread(target=self.move_faders, args=[stop], daemon=True).start()
+            sleep(0.2)
+
+            samples = []
+            timeouts = 0
+            for i in range(self.iterations):
+                latency = self.select(['input', 'output'][i % 2], i // 2 + 1)
+                if latency is None:
+                    timeouts += 1
+                else:
+                    samples.append(latency)
+                sleep(0.005)
+
+            stop.set()
+            results[f'device_latency_{round(self.simulator.write_latency * 1000)}ms'] = summary(samples, timeouts)
+
+        self.simulator.write_latency = self.simulator.read_latency = 0
+        self.client.send('/metering', 0)
+        self.writes.last(0, quiet=0.2)
+
+        return results
+
+    def move_faders(self, stop, interval=0.005):
+        """
+        Send output fader moves until stop is set
+        """
+        n = len(self.fireface.outputs)
+        i = 0
+        while not stop.is_set():
+            self.client.send(f'/output:volume-db:{i % n}', float(-60 + (i // n) % 60))
+            i += 1
+            sleep(interval)
+
+    def state_load(self):
+        """
+        State recall: /state load to notification and to last alsa write
+        """
+        # states are prepared in-process (not measured)
+        states = {'benchmark-a': -20.0, 'benchmark-b': -40.0}
+        for name, gain in states.items():
+            with self.engine.lock():
+                for out_index in range(len(self.fireface.outputs)):
+                    self.fireface.set(f'output:volume-db:{out_index}', gain / 2)
+                    for in_index in range(len(self.fireface.inputs)):
+                        self.fireface.set(f'monitor:input-gain:{out_index}:{in_index}', gain)
+                self.fireface.save(name)
+        self.writes.last(0, quiet=0.1)
+
+        notified = []
+        completed = []
+        timeouts = 0
+        for i in range(10):
+            name = list(states)[i % 2]
+            self.client.send('/current-state', name)
+            sleep(0.02)
+            t0 = self.client.send('/state', 'load')
+            t = self.client.messages.first(t0, lambda m: m[0] == '/NOTIFY' and 'loaded' in m[1][-1], timeout=5)
+            last = self.writes.last(t0, quiet=0.1)
+            if t is None or last is None:
+                timeouts += 1
+                continue
+            notified.append(t - t0)
+            completed.append(last - t0)
+
+        return {'notified': summary(notified, timeouts), 'completed': summary(completed, timeouts)}
+
+    def meters(self, duration=3):
+        """
+        Meter frames received by the client: rate and interval jitter
+        (frame transport only, the script transport sends a message per meter)
+        """
+        self.client.send('/metering', 1)
+        sleep(0.5)
+        t0 = perf_counter()
+        sleep(duration)
+        times = self.client.messages.count(t0, perf_counter(), lambda m: m[0] == '/meter-frame')
+        self.client.send('/metering', 0)
+
+        intervals = np.diff(times)
+        return {
+            'frames': len(times),
+            'frames_per_s': round(len(times) / duration, 1),
+            'target_per_s': self.config.meter_rate,
+            'jitter': summary(list(np.abs(intervals - 1 / self.config.meter_rate)))
+        }
+
+    def card_resync(self):
+        """
+        Card unplugged and plugged back: plug to card online and to last resync write
+        """
+        online = []
+        synced = []
+        timeouts = 0
+        for i in range(3):
+            t0 = perf_counter()
+            self.simulator.unplug()
+            self.client.wait_for(t0, '/card-online', [0], timeout=5)
+            t1 = perf_counter()
+            self.simulator.plug()
+            t = self.client.wait_for(t1, '/card-online', [1], timeout=10)
+            last = self.writes.last(t1, quiet=0.2)
+            if t is None:
+                timeouts += 1
+                continue
+            online.append(t - t1)
+            if last is not None:
+                synced.append(last - t1)
+
+        return {'online': summary(online, timeouts), 'synced': summary(synced)}
+
+    def service_recovery(self):
+        """
+        snd-fireface-ctl-service crash: kill to card online again (supervisor restart included)
+        """
+        samples = []
+        timeouts = 0
+        for i in range(3):
+            t0 = perf_counter()
+            self.simulator.crash_service()
+            self.client.wait_for(t0, '/card-online', [0], timeout=5)
+            t = self.client.wait_for(t0, '/card-online', [1], timeout=10)
+            self.writes.last(t0, quiet=0.2)
+            if t is None:
+                timeouts += 1
+                continue
+            samples.append(t - t0)
+
+        result = summary(samples, timeouts)
+        result['service'] = self.alsamixer.supervisor.snapshot()
+        return result
+
+def write_results(results, output):
+    """
+    Write json results to file (or stdout)
+    """
+    data = json.dumps(results, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(data + '\n')
+    else:
+        print(data)
+
+def main():
+
+    args, app_args = parser.parse_known_args()
+    sys.argv[1:] = app_args
+
+    if args.model:
+        Benchmark(args.model, args.iterations, args.output).run()
+        return
+
+    # one process per model (one engine per process)
+    results = {'version': __version__, 'models': {}}
+    for model in MODELS:
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        process = run([sys.executable, '-m', 'fireface_control.benchmark', '--model', model, '--iterations', str(args.iterations), '--output', path, *app_args])
+        try:
+            with open(path) as f:
+                results['models'][model] = json.load(f)
+        except ValueError:
+            results['models'][model] = {'error': f'benchmark process exited with code {process.returncode}'}
+        os.remove(path)
+
+    write_results(results, args.output)
+
+if __name__ == '__main__':
+
+    main()
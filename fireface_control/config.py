@@ -11,6 +11,12 @@ parser = ArgumentParser(prog='python -m fireface_control', formatter_class=Argum
 parser.add_argument('--port', help='http port for the web application', type=int, default=8080)
 parser.add_argument('--engine-port', help='osc port for the engine (random by default)', type=int, default=0)
 parser.add_argument('--dev', help='enable gui editor and launch gui client at startup (requires open-stage-control)', default=False, action='store_true')
+parser.add_argument('--alsa-backend', help='alsa control backend (hctl requires python3-pyalsa)', choices=['auto', 'hctl', 'amixer'], default='auto')
+parser.add_argument('--alsa-write-interval', help='minimum interval between alsa write flushes in ms (writes to the same element are coalesced)', type=float, default=2)
+parser.add_argument('--meter-rate', help='meter refresh rate in Hz', type=float, default=20)
+parser.add_argument('--meter-transport', help='meter transport to gui clients: binary frame per tick or one script message per meter', choices=['frame', 'script'], default='frame')
+parser.add_argument('--simulate', help='run against a simulated interface instead of the hardware (send SIGUSR1 to plug / unplug it)', choices=['802', 'UCX'], default=None)
+parser.add_argument('--trace', help='record control path traces, dumped as chrome trace json on SIGUSR2 (or /trace dump osc message) in ~/.config/fireface-control/traces/', default=False, action='store_true')
 parser.add_argument('--debug', '-d', help='log debug info (-dd for statistics)', default=0, action='count')
 parser.add_argument('--version', action='version', version=__version__)
 
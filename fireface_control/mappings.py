@@ -0,0 +1,211 @@
+"""
+Compiled mapping graph: parameter mappings evaluated in topological order,
+each affected mapping once per change cycle
+"""
+
+from heapq import heappush, heappop
+from time import perf_counter
+
+from .trace import tracer
+
+# evaluations of a single mapping allowed in one cycle (mappings in a loop re-evaluate until values settle)
+MAX_EVALUATIONS = 8
+
+class Mapping():
+    """
+    Mapping from source parameter(s) to destination parameter(s)
+    """
+
+    def __init__(self, index, src, dest, transform, condition=None, inverse=False):
+
+        self.index = index
+        self.src = src
+        self.dest = dest
+        self.transform = transform
+        self.condition = condition
+        # part of a mapping / inverse mapping pair
+        self.inverse = inverse
+        self.sources = src if type(src) is list else [src]
+        self.destinations = dest if type(dest) is list else [dest]
+        self.rank = 0
+
+class MappingGraph():
+    """
+    Mappings are compiled into a dependency graph (mapping B depends on mapping A
+    if A writes one of B's sources) and ranked in topological order.
+    Loops (inverse mappings) are ranked in creation order.
+
+    A change cycle starts with an external parameter change: mappings are
+    evaluated in rank order, changes made by a mapping queue its dependents
+    in the same cycle so that each destination is computed once, from settled sources.
+
+    Conditional mappings are indexed by their condition parameter,
+    whose state is tracked as it changes instead of being read at each evaluation.
+    """
+
+    def __init__(self, module):
+
+        self.module = module
+        self.mappings = []
+        # mapping indexes by source parameter
+        self.by_source = {}
+        # conditional mappings: {condition parameter: current state}
+        self.conditions = {}
+
+        self.queue = []
+        self.queued = set()
+        self.evaluations = {}
+        self.running = False
+        # hold cycles (transactions): queued mappings are evaluated by the next run()
+        self.deferred = False
+
+        self.stats = {'cycles': 0, 'evaluations': 0, 'max_evaluations': 0, 'last_source': None, 'last_evaluations': 0}
+
+    def add(self, src, dest, transform, inverse=None, condition=None):
+        """
+        Add mapping (and its inverse, from dest to src)
+        """
+        self.mappings.append(Mapping(len(self.mappings), src, dest, transform, condition, inverse is not None))
+        if inverse is not None:
+            self.mappings.append(Mapping(len(self.mappings), dest, src, inverse, condition, True))
+
+    def compile(self):
+        """
+        Index mappings by source and condition, compute ranks
+        """
+        self.by_source = {}
+        self.conditions = {}
+        for mapping in self.mappings:
+            for name in mapping.sources:
+                self.by_source.setdefault(name, []).append(mapping.index)
+            if mapping.condition is not None:
+                self.conditions[mapping.condition] = bool(self.module.get(mapping.condition))
+
+        # dependencies: mapping -> mappings reading its destinations
+        dependents = [set() for m in self.mappings]
+        incoming = [0] * len(self.mappings)
+        for mapping in self.mappings:
+            for name in mapping.destinations:
+                for index in self.by_source.get(name, []):
+                    if index not in dependents[mapping.index]:
+                        dependents[mapping.index].add(index)
+                        incoming[index] += 1
+
+        # kahn's algorithm, loops are broken at their first mapping
+        ready = [m.index for m in self.mappings if incoming[m.index] == 0]
+        remaining = set(range(len(self.mappings)))
+        rank = 0
+        while remaining:
+            if not ready:
+                ready = [min(remaining)]
+                incoming[ready[0]] = 0
+            next_ready = []
+            for index in sorted(ready):
+                if index not in remaining:
+                    continue
+                remaining.discard(index)
+                self.mappings[index].rank = rank
+                rank += 1
+                for dependent in dependents[index]:
+                    if dependent in remaining:
+                        incoming[dependent] -= 1
+                        if incoming[dependent] == 0:
+                            next_ready.append(dependent)
+            ready = next_ready
+
+    def computed(self):
+        """
+        Parameters always computed from others: destinations of unconditional one-way mappings
+        """
+        return set([name for m in self.mappings if m.condition is None and not m.inverse for name in m.destinations])
+
+    def evaluate_all(self):
+        """
+        Evaluate every mapping once (initial values)
+        """
+        for mapping in self.mappings:
+            self.enqueue(mapping)
+        self.run(None)
+
+    def changed(self, name, value):
+        """
+        Parameter changed: queue dependent mappings, start a cycle if none is running
+        """
+        if name in self.conditions:
+            self.conditions[name] = bool(value)
+
+        if name not in self.by_source:
+            return
+
+        for index in self.by_source[name]:
+            mapping = self.mappings[index]
+            if mapping.condition is None or self.conditions[mapping.condition]:
+                self.enqueue(mapping)
+
+        if not self.running and not self.deferred:
+            self.run(name)
+
+    def enqueue(self, mapping):
+
+        if mapping.index not in self.queued:
+            self.queued.add(mapping.index)
+            heappush(self.queue, (mapping.rank, mapping.index))
+
+    def run(self, source):
+        """
+        Evaluate queued mappings in rank order
+        """
+        self.running = True
+        evaluations = 0
+        start = perf_counter()
+        try:
+            while self.queue:
+                rank, index = heappop(self.queue)
+                self.queued.discard(index)
+                count = self.evaluations.get(index, 0)
+                if count >= MAX_EVALUATIONS:
+                    continue
+                self.evaluations[index] = count + 1
+                evaluations += 1
+                self.evaluate(self.mappings[index])
+        finally:
+            self.queue = []
+            self.queued = set()
+            self.evaluations = {}
+            self.running = False
+
+        self.stats['cycles'] += 1
+        self.stats['evaluations'] += evaluations
+        self.stats['max_evaluations'] = max(self.stats['max_evaluations'], evaluations)
+        self.stats['last_source'] = source
+        self.stats['last_evaluations'] = evaluations
+
+        if tracer.enabled:
+            tracer.complete('mappings', 'fireface', start, perf_counter(), source=source, evaluations=evaluations)
+
+    def evaluate(self, mapping):
+        """
+        Compute mapping and update destination(s) if their value changes
+        """
+        get = self.module.get
+        if mapping.condition is not None and not self.conditions[mapping.condition]:
+            return
+
+        value = mapping.transform(*[get(name) for name in mapping.sources])
+
+        if type(mapping.dest) is list:
+            for name, v in zip(mapping.destinations, value):
+                self.update(name, v)
+        else:
+            self.update(mapping.dest, value)
+
+    def update(self, name, value):
+
+        if type(value) is tuple:
+            value = list(value)
+        if self.module.get(name) == value:
+            return
+        if type(value) is list:
+            self.module.set(name, *value)
+        else:
+            self.module.set(name, value)
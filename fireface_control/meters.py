@@ -0,0 +1,96 @@
+"""
+Meter conversion stage: raw meter frames to dBs
+"""
+
+from math import log10
+from timeit import timeit
+from array import array
+
+import numpy as np
+
+METER_FULL_SCALE = 134217712
+METER_SILENCE = -138
+
+def meter_abs_to_db(v, noisefloor=-78):
+    """
+    Convert a single meter value to dBs
+    """
+    if v == 0:
+        v = METER_SILENCE
+    else:
+        v = 20*log10(v / METER_FULL_SCALE)
+        v = round(v*10) / 10
+        if v < noisefloor:
+            v = METER_SILENCE
+    return v
+
+class MeterStage():
+    """
+    Convert whole meter frames at once and keep track of displayed values
+    to report only the meters that changed.
+
+    Conversion uses a lookup table quantized to the displayed precision (0.1dB):
+    each step's raw threshold is precomputed and values are located with a binary search.
+    """
+
+    def __init__(self, size, noisefloor=-78):
+
+        self.noisefloor = noisefloor
+        self.values = np.full(size, METER_SILENCE, dtype=np.float64)
+
+        # steps from noise floor up to int32's max (~ +24dB)
+        steps = np.arange(noisefloor * 10, 250)
+        self.thresholds = METER_FULL_SCALE * np.power(10, (steps - 0.5) / 200)
+        self.table = np.concatenate([[METER_SILENCE], steps / 10])
+
+    def convert(self, frame):
+        """
+        Convert raw meter values to dBs (same rounding and noise floor as meter_abs_to_db)
+        """
+        return self.table[np.searchsorted(self.thresholds, np.asarray(frame), side='right')]
+
+    def update(self, frame, positions=None):
+        """
+        Convert a raw frame and store it, return the indices of the meters whose value changed.
+        positions: indices of the frame's values in the stage (all meters if omitted)
+        """
+        db = self.convert(frame)
+
+        if positions is None:
+            changed = np.flatnonzero(db != self.values)
+            self.values[changed] = db[changed]
+        else:
+            mask = db != self.values[positions]
+            changed = positions[mask]
+            self.values[changed] = db[mask]
+
+        return changed
+
+    def reset(self):
+        """
+        Set all meters to silence
+        """
+        self.values[:] = METER_SILENCE
+
+
+def benchmark(size=60, number=2000):
+    """
+    Compare per-value conversion with the vectorized stage
+    """
+    rng = np.random.default_rng(0)
+    frame = array('i', rng.integers(0, METER_FULL_SCALE, size).tolist())
+    stage = MeterStage(size)
+
+    per_value = timeit(lambda: [meter_abs_to_db(v) for v in frame], number=number)
+    vectorized = timeit(lambda: stage.update(frame), number=number)
+
+    assert stage.convert(frame).tolist() == [meter_abs_to_db(v) for v in frame]
+
+    print(f'{size} meters, {number} frames')
+    print(f'per-value:  {per_value / number * 1e6:.1f} us/frame')
+    print(f'vectorized: {vectorized / number * 1e6:.1f} us/frame')
+
+
+if __name__ == '__main__':
+
+    benchmark()
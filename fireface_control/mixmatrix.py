@@ -0,0 +1,145 @@
+"""
+Monitor mix matrix engine
+"""
+
+import numpy as np
+
+def volume_pan_to_gains(vol, pan, mute, in_range, out_range, dimmer_gain=0):
+    """
+    Vectorized FireFace.volume_pan_to_gains: returns (left gains, right gains) arrays
+    """
+    vol, pan, dimmer_gain = np.broadcast_arrays(np.asarray(vol, dtype=np.float64), pan, dimmer_gain)
+
+    muted = np.asarray(mute, dtype=bool) | (dimmer_gain <= in_range[0]) | (vol <= in_range[0])
+
+    # apply dimmer
+    vol = np.clip(vol + dimmer_gain, in_range[0], in_range[1])
+
+    # db to linear coef
+    g1 = np.power(10, (vol - 6) / 20)
+    g2 = g1.copy()
+
+    # apply simple pan: linear attenuation of the weakest side
+    pan = np.clip(pan, 0, 1)
+    g2 = np.where(pan < 0.5, g2 * pan * 2, g2)
+    g1 = np.where(pan > 0.5, g1 * (2 - 2 * pan), g1)
+
+    # map to out range
+    g1 = (g1 * (out_range[1] - out_range[0])).astype(np.int64) + out_range[0]
+    g2 = (g2 * (out_range[1] - out_range[0])).astype(np.int64) + out_range[0]
+
+    g1[muted] = out_range[0]
+    g2[muted] = out_range[0]
+
+    return g1, g2
+
+class MixMatrix():
+    """
+    Monitor mix matrix: gain, pan and mute for every (output, input) pair stored as arrays.
+    Changes mark cells dirty, flush() recomputes dirty cells only and returns the
+    mixer source gain elements that changed.
+
+    Stereo outputs use the first output's gain/pan/mute/monitor return for both channels
+    of the pair (left gain on the first output, right gain on the second).
+    """
+
+    def __init__(self, outputs, inputs, in_range=[-65, 6], out_range=[32768, 40960]):
+
+        n_out = len(outputs)
+        n_in = len(inputs)
+
+        self.in_range = in_range
+        self.out_range = out_range
+
+        self.gain = np.full((n_out, n_in), float(in_range[0]))
+        self.pan = np.full((n_out, n_in), 0.5)
+        self.mute = np.zeros((n_out, n_in), dtype=bool)
+        self.input_hide = np.zeros(n_in, dtype=bool)
+        self.monitor_return = np.zeros(n_out)
+        self.stereo = np.zeros(n_out, dtype=bool)
+
+        self.gains = np.full((n_out, n_in), out_range[0], dtype=np.int64)
+        self.dirty = np.ones((n_out, n_in), dtype=bool)
+
+        # input columns of each mixer source gain element (by input type)
+        self.input_types = {}
+        for in_index, (in_nth_of_type, in_type, in_name) in enumerate(inputs):
+            self.input_types.setdefault(in_type, []).append(in_index)
+        self.input_types = {t: np.array(cols) for t, cols in self.input_types.items()}
+
+        # stereo pairs: row whose settings drive each output, and channel side
+        rows = np.arange(n_out)
+        self.pair_first = rows - rows % 2
+        self.pair_second = rows % 2 == 1
+
+    def set_cell(self, attr, out_index, in_index, value):
+        """
+        Set monitor gain, pan or mute for an output/input pair
+        """
+        getattr(self, attr)[out_index, in_index] = value
+        self.dirty[self.pair_first[out_index]:self.pair_first[out_index] + 2, in_index] = True
+
+    def set_input_hide(self, in_index, value):
+        """
+        Hidden inputs are muted in every mix
+        """
+        self.input_hide[in_index] = value
+        self.dirty[:, in_index] = True
+
+    def set_monitor_return(self, out_index, value):
+        """
+        Set global dimmer for an output's monitor mix
+        """
+        self.monitor_return[out_index] = value
+        self.dirty[self.pair_first[out_index]:self.pair_first[out_index] + 2, :] = True
+
+    def set_stereo(self, out_index, value):
+        """
+        Set stereo state of an output's pair
+        """
+        self.stereo[self.pair_first[out_index]:self.pair_first[out_index] + 2] = value
+        self.dirty[self.pair_first[out_index]:self.pair_first[out_index] + 2, :] = True
+
+    def flush(self):
+        """
+        Recompute dirty cells, return changed elements as a list of (out_index, in_type, gains)
+        """
+        out_indexes, in_indexes = np.nonzero(self.dirty)
+        if not len(out_indexes):
+            return []
+        self.dirty[:] = False
+
+        stereo = self.stereo[out_indexes]
+        rows = np.where(stereo, self.pair_first[out_indexes], out_indexes)
+
+        left, right = volume_pan_to_gains(
+            self.gain[rows, in_indexes],
+            self.pan[rows, in_indexes],
+            self.mute[rows, in_indexes] | self.input_hide[in_indexes],
+            self.in_range,
+            self.out_range,
+            dimmer_gain=self.monitor_return[rows]
+        )
+        gains = np.where(stereo & self.pair_second[out_indexes], right, left)
+
+        changed = gains != self.gains[out_indexes, in_indexes]
+        self.gains[out_indexes, in_indexes] = gains
+
+        changed_cells = np.zeros(self.gains.shape, dtype=bool)
+        changed_cells[out_indexes[changed], in_indexes[changed]] = True
+
+        elements = []
+        for out_index in np.flatnonzero(changed_cells.any(axis=1)).tolist():
+            for in_type, cols in self.input_types.items():
+                if changed_cells[out_index, cols].any():
+                    elements.append((out_index, in_type, self.gains[out_index, cols].tolist()))
+
+        return elements
+
+    def element_gains(self, out_index, in_type):
+        """
+        Current gains of a mixer source gain element
+        """
+        if in_type not in self.input_types:
+            return []
+        return self.gains[out_index, self.input_types[in_type]].tolist()
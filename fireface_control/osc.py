@@ -1,29 +1,94 @@
 import os
+import json
+import socket
 
 from subprocess import Popen, PIPE, DEVNULL
 from sys import argv
+from time import perf_counter
+from collections import deque
+
+import numpy as np
 
 from mentat import Module
 
 from .config import config
 from . import __version__
+from .oscpacket import encode_message, encode_bundle
+from .stats import stats
+from .trace import tracer
+
+# maximum size of osc bundles sent when pushing the whole state (bytes)
+MAX_BUNDLE_SIZE = 8192
+# number of parameter changes kept for incremental resyncs
+JOURNAL_SIZE = 4096
+# statistics log interval with -dd (seconds)
+STATS_LOG_INTERVAL = 10
+# address prefix of messages from / to a single gui client: /_client/{client id}/{address} (see cm.js)
+CLIENT_PREFIX = '/_client/'
+# channel selection parameters (global selection, see OSC.selection)
+SELECT_PARAMETERS = ['input:select', 'output:select']
+
+def address_class(address):
+    """
+    Statistics class of an osc address: parameter kind or command (eg '/output:volume-db:1' -> 'output')
+    """
+    if address.startswith(CLIENT_PREFIX):
+        address = address[address.index('/', len(CLIENT_PREFIX)):]
+    return address[1:].partition(':')[0]
 
 class OSC(Module):
 
-    def __init__(self, fireface, *args, **kwargs):
+    def __init__(self, fireface, *args, gui=True, **kwargs):
         """
         Open Stage Control manager, runs the server and bridges between fireface's parameters and widget state
+        (gui=False: don't run the server, osc clients are expected to connect to self.port on their own)
         """
 
         super().__init__('OSC', *args, **kwargs)
 
         self.engine.add_event_callback('parameter_changed', self.parameter_changed)
         self.fireface = fireface
+        self.fireface.add_event_callback('meter_frame', self.send_meter_frame)
+        self.fireface.add_event_callback('transaction_committed', self.transaction_committed)
         self.local_state = {}
         self.remote_state = {}
         self.first_connect = False
         self.clipboard = {}
 
+        # gui clients (open-stage-control client ids) and their own channel selections:
+        # {client id: {'input': channel index, 'output': channel index}}
+        self.clients = {}
+        # (client id, parameter name) of the client message being routed (see parameter_changed)
+        self.sender = None
+
+        # pre-serialized selection states: {(kind, channel index): {client id: osc bundle}}
+        self.selection_bundles = {}
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        # state pushes: id of the last push and connect-to-rendered time stats (ms)
+        self.state_push = {'id': 0, 'time': 0}
+        self.render_stats = {'count': 0, 'last': 0, 'max': 0}
+        stats.register('render', lambda: dict(self.render_stats))
+        if config.debug >= 2:
+            self.engine.add_event_callback('started', lambda: self.start_scene('stats', self.log_stats))
+
+        # change journal: sequence number of the last change and (sequence, name) of recent changes
+        self.sequence = 0
+        self.journal = deque(maxlen=JOURNAL_SIZE)
+        self.journal_dropped = 0
+        # parameters changed during a fireface transaction, sent when it commits
+        self.transaction_names = {}
+
+        # parameters filtered out when their channel is not selected: {name: (selection kind, channel index)}
+        self.selection_filter = {}
+        for name, (kind, attr, fx, out_index, in_index) in self.fireface.name_index.items():
+            if attr == 'select':
+                continue
+            if kind == 'input' and attr not in ['color', 'name', 'hide', 'mute', 'hardware-name', 'type', 'mic-power', 'mic-instrument']:
+                self.selection_filter[name] = ('input', in_index)
+            elif kind == 'monitor' or kind == 'output' and fx in ['eq', 'dyn', 'autolevel']:
+                self.selection_filter[name] = ('output', out_index)
+
         folder = os.path.dirname(os.path.abspath(__file__))
 
         # run instance of o-s-c (will quit when python process exits if everything goes well)
@@ -47,14 +112,16 @@ class OSC(Module):
             cmd_args.append('prod=1')
             cmd_args.append('--read-only')
             cmd_args.append('--no-gui')
-            self.engine.add_event_callback('stopping', lambda: self.process.kill())
+            self.engine.add_event_callback('stopping', lambda: self.process.kill() if self.process else None)
 
-        if not config.dev or not self.engine.restarted:
+        self.process = None
+        if gui and (not config.dev or not self.engine.restarted):
             self.process = Popen(
                 cmd + cmd_args,
                 stderr=None if config.debug else DEVNULL,
                 stdout=None if config.debug else DEVNULL
             )
+            stats.count('subprocess.open-stage-control')
 
         if config.dev and self.engine.restarted:
             self.first_connect = True
@@ -77,132 +144,462 @@ class OSC(Module):
                     self.send('/SCRIPT', f'set("{name}", {value[0] - 100 * (1 - self.fireface.get('metering'))}, {'{sync: false, send:false}'})')
             else:
                 self.local_state[name] = value
+                self.invalidate_selection_bundle(name)
+                self.journal_change(name)
+
+                if self.fireface.transaction_depth:
+                    self.transaction_names[name] = True
+                    return
 
                 if not self.first_connect:
                     return
-                if name == 'output:select' or name == f'output:stereo:{self.fireface.get('output:select')}':
-                    self.send_output_sel_state()
-                if name == 'input:select':
-                    self.send_input_sel_state()
+
+                if name in SELECT_PARAMETERS:
+                    # selection changed on the engine side (state recall, osc client without id):
+                    # applies to every gui client
+                    kind = name.split(':')[0]
+                    for selection in self.clients.values():
+                        selection[kind] = value[0]
+                    if kind == 'output':
+                        self.send_output_sel_state()
+                    else:
+                        self.send_input_sel_state()
+                    return
+
+                if 'output:stereo:' in name:
+                    self.stereo_changed(int(name.split(':')[-1]), value[0])
 
                 if name == 'card-online':
                     self.send('/NOTIFY', f'power-off', f'Fireface {'disconnected' if value == [0] else 'connected'}')
 
 
                 if name in self.remote_state and self.remote_state[name] == value and 'stereo:' not in name:
-                    return
-
-                if self.filter_param(name) is False:
+                    if self.sender and self.sender[1] == name and self.sender[0] is not None:
+                        # value sent by a gui client: forward it to the other clients
+                        self.send_param(name, value, exclude=self.sender[0])
                     return
 
                 self.remote_state[name] = value
-                self.send(f'/{name}', *value)
+                self.send_param(name, value)
 
         elif name == 'gui-clients':
             self.logger.debug(f'osc clients connected = {value}')
 
-    def send_state(self):
+    def send(self, address, *args):
+        """
+        Send message to open-stage-control
+        """
+        stats.count(f'osc.out.{address_class(address)}')
+        super().send(address, *args)
+
+    def send_param(self, name, value, exclude=None):
+        """
+        Send parameter value to the gui clients that display it:
+            - channel parameters filtered by selection to the clients that selected the channel
+            - other parameters to all clients
+        exclude: id of a client that must not receive it (the one it comes from).
+        Without known clients, values are broadcast according to the global selection.
+        """
+        if not self.clients or exclude is None and name not in self.selection_filter:
+            if exclude is None and self.filter_param(name) is not False:
+                self.send(f'/{name}', *value)
+            return
+
+        for client_id in self.clients:
+            if client_id != exclude and self.filter_param(name, client_id) is not False:
+                self.send(f'{CLIENT_PREFIX}{client_id}/{name}', *value)
+
+    def selection(self, client_id=None):
+        """
+        Channel selection of a gui client (initialized with the global selection),
+        global selection if client_id is None
+        """
+        if client_id is None:
+            return {'input': self.fireface.get('input:select'), 'output': self.fireface.get('output:select')}
+
+        if client_id not in self.clients:
+            self.clients[client_id] = self.selection()
+            self.logger.debug(f'gui client {client_id} registered ({len(self.clients)} clients)')
+
+        return self.clients[client_id]
+
+    def client_closed(self, client_id):
+        """
+        A gui client disconnected: forget its selection
+        """
+        self.clients.pop(client_id, None)
+        for bundles in self.selection_bundles.values():
+            bundles.pop(client_id, None)
+
+    def select(self, client_id, kind, index):
+        """
+        Channel selection from a gui client: only its own view changes
+        """
+        self.selection(client_id)[kind] = index
+        if kind == 'output':
+            self.send_output_sel_state(client_id)
+        else:
+            self.send_input_sel_state(client_id)
+
+    def stereo_changed(self, index, value):
+        """
+        Output stereo link changed: resend the selection state of clients that selected the output,
+        clients that selected the right channel of a new stereo pair switch to the pair.
+        Without known clients, the global selection is switched instead.
+        """
+        if not self.clients:
+            if value == 1 and index % 2 and self.fireface.get('output:select') == index:
+                self.fireface.set('output:select', index - 1)
+            elif index == self.fireface.get('output:select'):
+                self.send_output_sel_state()
+            return
+
+        for client_id, selection in self.clients.items():
+            if value == 1 and index % 2 and selection['output'] == index:
+                selection['output'] = index - 1
+                self.send_output_sel_state(client_id)
+            elif selection['output'] == index:
+                self.send_output_sel_state(client_id)
+
+    def send_state(self, client_id=None):
         """
         Send local state when a new osc client connects (or if it refreshes).
         This module doesn't have its own parameters and instead watches fireface's,
         it uses its own value store to optimize traffic where possible.
+        The state is sent to the client only if its id is known, broadcast otherwise.
         """
 
         super().send_state()
 
-        self.send('/output:select', self.fireface.get('output:select'))
-        self.send('/input:select', self.fireface.get('input:select'))
+        self.state_push['id'] += 1
+        self.state_push['time'] = perf_counter()
 
+        prefix = f'{CLIENT_PREFIX}{client_id}' if client_id is not None else ''
+        selection = self.selection(client_id)
 
-        state = list(self.local_state.items())
-        state.sort(key=lambda item: self.fireface.parameters[item[0]].metadata['osc_order'] if 'osc_order' in self.fireface.parameters[item[0]].metadata else 0)
-        for name, value in state:
-            if self.filter_param(name) is not False:
-                self.send(f'/{name}', *value)
+        messages = [
+            encode_message(f'{prefix}/output:select', selection['output']),
+            encode_message(f'{prefix}/input:select', selection['input'])
+        ]
+
+        for name in self.fireface.osc_order:
+            if name in self.local_state and name not in SELECT_PARAMETERS and self.filter_param(name, client_id) is not False:
+                messages.append(encode_message(f'{prefix}/{name}', *self.local_state[name]))
 
         for name, value in self.engine.modules['Settings'].get_state():
-            self.send('/settings', name, value)
+            messages.append(encode_message(f'{prefix}/settings', name, value))
+
+        if config.meter_transport == 'frame':
+            messages.append(encode_message('/meter-layout', *self.fireface.meter_names))
+            messages.append(encode_message('/meter-frame', self.meter_frame(self.fireface.meter_stage.values)))
+
+        messages.append(encode_message(f'{prefix}/journal-sequence', self.sequence))
+
+        # clients report back once they've processed the whole state
+        messages.append(encode_message(f'{prefix}/SCRIPT', f'send("/state-rendered", {self.state_push['id']})'))
+
+        bundles = self.send_bundles(messages)
+        self.logger.debug(f'state push #{self.state_push['id']}: {len(messages)} messages sent in {bundles} bundles')
+
+    def journal_change(self, name):
+        """
+        Record a local state change
+        """
+        if len(self.journal) == self.journal.maxlen:
+            self.journal_dropped = self.journal[0][0]
+        self.sequence += 1
+        self.journal.append((self.sequence, name))
 
-    def send_output_sel_state(self):
+    def client_resync(self, client_id, since):
+        """
+        A lost client is back: send the changes made after the last journal sequence
+        it received (see cm.js), or the whole state if the journal doesn't go back far enough
+        (or if the sequence comes from a previous engine run)
+        """
+        since = int(since)
+        if since < self.journal_dropped or since > self.sequence:
+            self.logger.debug(f'gui client {client_id} back, sending full state')
+            self.send_state(client_id)
+            return
+
+        names = list(dict.fromkeys([name for seq, name in self.journal if seq > since]))
+
+        messages = []
+        for name in names:
+            if name not in SELECT_PARAMETERS and self.filter_param(name, client_id) is not False:
+                messages.append(encode_message(f'{CLIENT_PREFIX}{client_id}/{name}', *self.local_state[name]))
+
+        if config.meter_transport == 'frame':
+            # reset meters cache in custom module
+            messages.append(encode_message('/meter-layout', *self.fireface.meter_names))
+
+        messages.append(encode_message(f'{CLIENT_PREFIX}{client_id}/journal-sequence', self.sequence))
+
+        bundles = self.send_bundles(messages)
+        self.send_input_sel_state(client_id)
+        self.send_output_sel_state(client_id)
+
+        self.logger.debug(f'gui client {client_id} back, {len(names)} changes since #{since} sent in {bundles} bundles')
+
+    def send_bundles(self, messages):
+        """
+        Send encoded messages packed in size-bounded bundles,
+        return the number of bundles sent
+        """
+        bundles = 0
+        bundle = []
+        size = 16 # bundle header + time tag
+        for message in messages:
+            if bundle and size + 4 + len(message) > MAX_BUNDLE_SIZE:
+                self.send_datagram(encode_bundle(bundle))
+                bundles += 1
+                bundle = []
+                size = 16
+            bundle.append(message)
+            size += 4 + len(message)
+
+        if bundle:
+            self.send_datagram(encode_bundle(bundle))
+            bundles += 1
+
+        return bundles
+
+    def state_rendered(self, push_id):
+        """
+        Client processed a state push: measure connect-to-rendered time
+        """
+        if push_id != self.state_push['id']:
+            return
+
+        elapsed = (perf_counter() - self.state_push['time']) * 1000
+        self.render_stats['count'] += 1
+        self.render_stats['last'] = elapsed
+        self.render_stats['max'] = max(self.render_stats['max'], elapsed)
+        self.logger.debug(f'state push #{push_id} rendered in {elapsed:.1f}ms (max {self.render_stats['max']:.1f}ms)')
+
+    def send_meter_frame(self, values):
+        """
+        Send all meter values in a single message (see meter_frame)
+        """
+        if not self.first_connect:
+            return
+        self.send('/meter-frame', ('b', self.meter_frame(values)))
+
+    def meter_frame(self, values):
+        """
+        Encode meter values: int16 blob (little endian) of dB values * 10, ordered as in /meter-layout
+        """
+        frame = np.round(values * 10).astype('<i2') - 1000 * (1 - self.fireface.get('metering'))
+        return frame.astype('<i2').tobytes()
+
+    def send_output_sel_state(self, client_id=None):
         """
         Send values related to output channel selection:
             - output fxs
             - output options
             - monitor mix for this output
+        Values are sent as a single bundle, cached until one of them changes.
+        Sent to given client, or to each known client (its own selection) if client_id is None.
         """
-        output_select = self.fireface.get('output:select')
-        output_select_str = str(output_select)
-        self.send('/output:select', self.fireface.get('output:select'))
-        for name, value in self.local_state.items():
-            if 'output:' in name and name.split(':')[-1] == output_select_str:
-                if name.split(':')[1] not in ['mute', 'pan', 'volume-db', 'hide']:
-                    self.send(f'/{name}', *value)
+        if client_id is None and self.clients:
+            for client_id in self.clients:
+                self.send_output_sel_state(client_id)
+            return
 
-            elif 'monitor:' in name and name.split(':')[-2] == output_select_str:
-                self.send(f'/{name}', *value)
+        output_select = self.selection(client_id)['output']
+        bundles = self.selection_bundles.setdefault(('output', output_select), {})
+
+        if client_id not in bundles:
+            prefix = f'{CLIENT_PREFIX}{client_id}' if client_id is not None else ''
+            messages = [encode_message(f'{prefix}/output:select', output_select)]
+            for name in self.fireface.channel_parameters('output', output_select):
+                if name in self.local_state and self.fireface.name_index[name][1] not in ['mute', 'pan', 'volume-db', 'hide']:
+                    messages.append(encode_message(f'{prefix}/{name}', *self.local_state[name]))
 
-        for name in ['output:stream-return-matrix']:
-            if self.fireface.get(f'output:stereo:{output_select}'):
-                self.send(f'/{name}:{output_select + 1}', self.fireface.get(f'{name}:{output_select + 1}'))
+            for name in self.fireface.channel_parameters('monitor', output_select):
+                if name in self.local_state:
+                    messages.append(encode_message(f'{prefix}/{name}', *self.local_state[name]))
 
+            for name in ['output:stream-return-matrix']:
+                value = self.fireface.get(f'{name}:{output_select + 1}')
+                if self.fireface.get(f'output:stereo:{output_select}') and type(value) is list:
+                    messages.append(encode_message(f'{prefix}/{name}:{output_select + 1}', *value))
 
-    def send_input_sel_state(self):
+            bundles[client_id] = encode_bundle(messages)
+
+        self.send_datagram(bundles[client_id])
+
+
+    def send_input_sel_state(self, client_id=None):
         """
         Send values related to input channel selection:
             - input fxs
             - input options
+        Values are sent as a single bundle, cached until one of them changes.
+        Sent to given client, or to each known client (its own selection) if client_id is None.
         """
-        input_select = str(self.fireface.get('input:select'))
-        self.send('/input:select', self.fireface.get('input:select'))
-        for name, value in self.local_state.items():
-            if 'input:' in name and name.split(':')[-1] == input_select:
-                if name.split(':')[1] not in ['mute', 'hide', 'type']:
-                    self.send(f'/{name}', *value)
+        if client_id is None and self.clients:
+            for client_id in self.clients:
+                self.send_input_sel_state(client_id)
+            return
+
+        input_select = self.selection(client_id)['input']
+        bundles = self.selection_bundles.setdefault(('input', input_select), {})
+
+        if client_id not in bundles:
+            prefix = f'{CLIENT_PREFIX}{client_id}' if client_id is not None else ''
+            messages = [encode_message(f'{prefix}/input:select', input_select)]
+            for name in self.fireface.channel_parameters('input', input_select):
+                if name in self.local_state and self.fireface.name_index[name][1] not in ['mute', 'hide', 'type']:
+                    messages.append(encode_message(f'{prefix}/{name}', *self.local_state[name]))
+
+            bundles[client_id] = encode_bundle(messages)
 
-    def send_sel_states(self):
+        self.send_datagram(bundles[client_id])
+
+    def invalidate_selection_bundle(self, name):
         """
-        Force update gui sel states if they havent changed but general state has
+        Drop cached selection bundles that include a parameter
         """
-        def sc():
-            with self.engine.lock():
-                self.send_input_sel_state()
-                self.send_output_sel_state()
-        self.start_scene('send_sel_states', sc)
+        if name not in self.fireface.name_index:
+            return
+
+        kind, attr, fx, out_index, in_index = self.fireface.name_index[name]
+        if kind == 'input':
+            self.selection_bundles.pop(('input', in_index), None)
+        elif kind in ['output', 'monitor'] and out_index is not None:
+            # output selection bundles include the next output's stream return matrix (stereo pairs)
+            self.selection_bundles.pop(('output', out_index), None)
+            self.selection_bundles.pop(('output', out_index - 1), None)
+
+    def send_datagram(self, data):
+        """
+        Send pre-serialized osc packet to open-stage-control
+        """
+        stats.count('osc.out.datagram')
+        stats.count('osc.out.datagram-bytes', len(data))
+        self.socket.sendto(data, ('127.0.0.1', self.port))
 
-    def filter_param(self, name):
+    def transaction_committed(self):
+        """
+        Send parameters changed during a fireface transaction in bundles,
+        then selection states
+        """
+        names = list(self.transaction_names)
+        self.transaction_names = {}
+
+        if not self.first_connect:
+            return
+
+        messages = []
+        for name in names:
+            value = self.local_state[name]
+            if name in SELECT_PARAMETERS:
+                # engine side selection change (see parameter_changed), sent with selection states
+                for selection in self.clients.values():
+                    selection[name.split(':')[0]] = value[0]
+                continue
+            if name in self.remote_state and self.remote_state[name] == value and 'stereo:' not in name:
+                continue
+            if self.clients and name in self.selection_filter:
+                # channel parameters: only to the clients that selected the channel
+                self.remote_state[name] = value
+                for client_id in self.clients:
+                    if self.filter_param(name, client_id) is not False:
+                        messages.append(encode_message(f'{CLIENT_PREFIX}{client_id}/{name}', *value))
+                continue
+            if self.filter_param(name) is False:
+                continue
+            self.remote_state[name] = value
+            messages.append(encode_message(f'/{name}', *value))
+
+        # values sent one by one don't carry the sequence: it may lag behind,
+        # which only makes resyncs send a few more values than needed
+        messages.append(encode_message('/journal-sequence', self.sequence))
+
+        bundles = self.send_bundles(messages)
+        self.send_input_sel_state()
+        self.send_output_sel_state()
+
+        self.logger.debug(f'transaction: {len(messages) - 1}/{len(names)} changes sent in {bundles} bundles')
+
+    def filter_param(self, name, client_id=None):
         """
         Filter out unneeded value to reduce traffic:
             - input parameters for unselected input
             - monitor mix for unselected output
             - output fx for unselect output
+        Selection of given gui client, global selection if client_id is None
         """
-        output_select = str(self.fireface.get('output:select'))
-        input_select = str(self.fireface.get('input:select'))
-
-        if ':select' in name:
-            return True
-
-        if 'input:' in name and name.split(':')[1] not in ['color', 'name', 'hide', 'mute', 'hardware-name', 'type', 'mic-power', 'mic-instrument'] and name.split(':')[-1] != input_select:
-            return False
-
-        if 'monitor:' in name and name.split(':')[-2] != output_select:
-            return False
+        if name in self.selection_filter:
+            kind, channel = self.selection_filter[name]
+            if client_id is None:
+                selected = self.fireface.get(f'{kind}:select')
+            else:
+                selected = self.selection(client_id)[kind]
+            if channel != selected:
+                return False
 
-        if 'output:' in name and (':eq' in name or ':dyn' in name or ':hpf' in name or ':autolevel' in name) and name.split(':')[-1] != output_select:
-            return False
 
+    def log_stats(self):
+        """
+        Log statistics periodically (-dd)
+        """
+        while True:
+            self.wait(STATS_LOG_INTERVAL, 's')
+            self.logger.debug(f'stats: {stats.summary()}')
 
     def route(self, address, args):
         """
         Widget routing
         """
+        timer = perf_counter()
+        stats.count(f'osc.in.{address_class(address)}')
+
+        client_id = None
+        if address.startswith(CLIENT_PREFIX):
+            # message from a gui client, tagged with its id (see cm.js)
+            client_id, _, address = address[len(CLIENT_PREFIX):].partition('/')
+            address = f'/{address}'
+            self.selection(client_id)
 
         if address == '/server-ready':
             self.logger.info(f'web app available at {self.url}')
 
         elif address == '/connect':
             self.first_connect = True
-            self.send_state()
+            if args and client_id is not None:
+                # reconnection without reload, with the last journal sequence received (see cm.js)
+                self.client_resync(client_id, *args)
+            else:
+                self.send_state(client_id)
+
+        elif address == '/gui-client-open':
+            self.selection(*args)
+
+        elif address == '/gui-client-close':
+            self.client_closed(*args)
+
+        elif address in ['/input:select', '/output:select'] and client_id is not None:
+            self.select(client_id, address[1:].split(':')[0], *args)
+
+        elif address == '/state-rendered':
+            self.state_rendered(*args)
+
+        elif address == '/trace':
+            cmd = args[0].lower() if args else ''
+            if cmd == 'start':
+                tracer.start()
+            elif cmd == 'stop':
+                tracer.stop()
+            elif cmd == 'dump':
+                self.send('/trace', tracer.dump())
+
+        elif address == '/stats':
+            if args and args[0] == 'reset':
+                stats.reset()
+            else:
+                self.send('/stats', json.dumps(stats.snapshot()))
 
         elif address == '/state':
             cmd = args[0].lower()
@@ -212,9 +609,7 @@ class OSC(Module):
                 self.send('/current-state', self.fireface.get('current-state'))
                 self.send('/NOTIFY', 'save', f'State {state_name} saved',)
             elif cmd == 'load' and state_name:
-                self.fireface.soft_reset()
-                self.fireface.load(state_name)
-                self.send_sel_states()
+                self.fireface.recall(state_name)
                 self.send('/NOTIFY', 'folder-open', f'State {state_name} loaded'),
             elif cmd == 'delete' and state_name:
                 self.fireface.delete(state_name)
@@ -222,24 +617,26 @@ class OSC(Module):
                 self.send('/NOTIFY', 'trash', f'State {state_name} deleted')
             elif cmd == 'reset':
                 self.fireface.soft_reset()
-                self.send_sel_states()
                 self.send('/NOTIFY', 'undo', 'State reset')
 
 
         elif address == '/fx':
             strip_type, fx, cmd = [a.lower() for a in args]
-            if strip_type:
-                select = str(self.fireface.get(f'{strip_type}:select'))
+            if fx in ['echo', 'reverb']:
+                names = self.fireface.fx_params[fx]
+            elif strip_type:
+                select = self.selection(client_id)[strip_type]
+                names = [n for n in self.fireface.channel_parameters(strip_type, select) if self.fireface.name_index[n][2] == fx]
+            else:
+                names = []
 
             if cmd == 'copy':
                 self.clipboard[fx] = {}
-                for name in self.local_state:
-                    if fx == 'echo' and (':echo' in name) or fx == 'reverb' and (':reverb' in name):
-                        self.clipboard[fx][name] = self.local_state[name]
-                    elif strip_type and f'{strip_type}:' in name and name.split(':')[-1] == select:
-                        if fx == 'eq' and (':eq' in name or ':hpf' in name) or fx == 'dyn' and (':dyn' in name) or fx == 'autolevel' and (':autolevel' in name):
-                            generic_name = ':'.join(name.split(':')[1:-1])
-                            self.clipboard[fx][generic_name] = self.local_state[name]
+                for name in names:
+                    if name in self.local_state:
+                        # strip fxs are stored by attribute name (without channel index)
+                        key = name if fx in ['echo', 'reverb'] else self.fireface.name_index[name][1]
+                        self.clipboard[fx][key] = self.local_state[name]
 
             elif cmd == 'paste':
                 if fx in self.clipboard:
@@ -251,12 +648,9 @@ class OSC(Module):
 
 
             elif cmd == 'reset':
-                for name in self.local_state:
-                    if fx == 'echo' and (':echo' in name) or fx == 'reverb' and (':reverb' in name):
+                for name in names:
+                    if name in self.local_state:
                         self.fireface.reset(name)
-                    elif strip_type and f'{strip_type}:' in name and name.split(':')[-1] == select:
-                        if fx == 'eq' and (':eq' in name or ':hpf' in name) or fx == 'dyn' and (':dyn' in name) or fx == 'autolevel' and (':autolevel' in name):
-                            self.fireface.reset(name)
 
         elif address == '/settings':
             settings = self.engine.modules['Settings']
@@ -276,4 +670,13 @@ class OSC(Module):
             name = address[1:]
             if self.fireface.get_parameter(name):
                 self.remote_state[name] = args
-                self.fireface.set(name, *args)
+                self.sender = (client_id, name)
+                try:
+                    self.fireface.set(name, *args)
+                finally:
+                    self.sender = None
+
+        end = perf_counter()
+        stats.observe('osc.route', end - timer)
+        if tracer.enabled:
+            tracer.complete('route', 'osc', timer, end, address=address)
@@ -0,0 +1,105 @@
+"""
+Minimal osc packet encoding, used to pre-serialize messages and bundles
+that are sent as raw datagrams (and decoding, used by scripted osc clients)
+"""
+
+import struct
+
+BUNDLE_HEADER = b'#bundle\0'
+# immediate time tag
+TIMETAG_NOW = struct.pack('>Q', 1)
+
+def pad(data):
+    """
+    Pad data to a multiple of 4 bytes
+    """
+    return data + b'\0' * (-len(data) % 4)
+
+def encode_string(value):
+    """
+    Null terminated, padded string
+    """
+    return pad(value.encode('utf-8') + b'\0')
+
+def encode_message(address, *args):
+    """
+    Encode an osc message, argument types are inferred from python types:
+    int (i), float (f), str (s), bytes or ('b', bytes) (b)
+    """
+    tags = ','
+    data = b''
+    for arg in args:
+        if type(arg) is tuple and len(arg) == 2 and arg[0] == 'b':
+            arg = arg[1]
+        if isinstance(arg, float):
+            tags += 'f'
+            data += struct.pack('>f', arg)
+        elif isinstance(arg, str):
+            tags += 's'
+            data += encode_string(arg)
+        elif isinstance(arg, (bytes, bytearray)):
+            tags += 'b'
+            data += struct.pack('>i', len(arg)) + pad(bytes(arg))
+        else:
+            tags += 'i'
+            data += struct.pack('>i', int(arg))
+
+    return encode_string(address) + encode_string(tags) + data
+
+def encode_bundle(messages):
+    """
+    Encode a bundle of already encoded messages
+    """
+    data = BUNDLE_HEADER + TIMETAG_NOW
+    for message in messages:
+        data += struct.pack('>i', len(message)) + message
+    return data
+
+def decode_string(data, offset):
+    """
+    Read a padded string, return (string, next offset)
+    """
+    end = data.index(b'\0', offset)
+    return data[offset:end].decode('utf-8'), offset + (end - offset) // 4 * 4 + 4
+
+def decode_message(data):
+    """
+    Decode an osc message: (address, [args])
+    """
+    address, offset = decode_string(data, 0)
+    tags, offset = decode_string(data, offset)
+    args = []
+    for tag in tags[1:]:
+        if tag == 'i':
+            args.append(struct.unpack_from('>i', data, offset)[0])
+            offset += 4
+        elif tag == 'f':
+            args.append(struct.unpack_from('>f', data, offset)[0])
+            offset += 4
+        elif tag == 's':
+            value, offset = decode_string(data, offset)
+            args.append(value)
+        elif tag == 'b':
+            size = struct.unpack_from('>i', data, offset)[0]
+            args.append(data[offset + 4:offset + 4 + size])
+            offset += 4 + size + (-size % 4)
+        elif tag == 'T':
+            args.append(True)
+        elif tag == 'F':
+            args.append(False)
+    return address, args
+
+def decode_packet(data):
+    """
+    Decode an osc packet (message or bundle): list of (address, [args])
+    """
+    if not data.startswith(BUNDLE_HEADER):
+        return [decode_message(data)]
+
+    messages = []
+    offset = len(BUNDLE_HEADER) + 8
+    while offset < len(data):
+        size = struct.unpack_from('>i', data, offset)[0]
+        messages.extend(decode_packet(data[offset + 4:offset + 4 + size]))
+        offset += 4 + size
+    return messages
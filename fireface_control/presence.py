@@ -0,0 +1,122 @@
+"""
+Card presence detection driven by inotify events
+"""
+
+import os
+from threading import Lock, Timer
+
+import pyinotify
+
+# the status file may not be readable yet when the device node appears (firewire enumeration):
+# presence is checked again at these times after each event (seconds)
+RECHECK_DELAYS = [0.1, 0.25, 0.5, 1, 2, 4]
+
+def read_status(path):
+    """
+    Read a card status file, return its content ('' if it doesn't exist)
+    """
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return ''
+
+class CardPresence():
+    """
+    Watch sound device directories and report card presence changes.
+
+    Kernel events (device nodes added/removed in /dev/snd) wake the watcher up,
+    presence is then confirmed by reading the card's status file in procfs.
+    Device directories (watch) only report nodes being created / removed:
+    alsa clients open devices read-write, so file writes would fire on every close.
+    Procfs itself doesn't emit inotify events but it is watched as well (watch_status,
+    file writes included) so that a fake procfs directory can be used instead of the real one.
+    Since procfs may lag behind, presence is checked a few more times after each event.
+    """
+
+    def __init__(self, status_path, callback, watch=[], watch_status=[]):
+
+        self.status_path = status_path
+        self.callback = callback
+        self.online = None
+
+        # check_lock serializes checks and callbacks, lock guards recheck scheduling
+        self.check_lock = Lock()
+        self.lock = Lock()
+        self.recheck_timer = None
+        # incremented by each event, pending rechecks of older events are dropped
+        self.generation = 0
+        self.stopped = False
+
+        self.watch_manager = pyinotify.WatchManager()
+        self.notifier = pyinotify.ThreadedNotifier(self.watch_manager, self.process_event)
+        self.notifier.daemon = True
+
+        mask = pyinotify.IN_CREATE | pyinotify.IN_DELETE | pyinotify.IN_MOVED_TO | pyinotify.IN_MOVED_FROM
+        for paths, path_mask in [(watch, mask), (watch_status, mask | pyinotify.IN_CLOSE_WRITE)]:
+            for path in paths:
+                if os.path.isdir(path):
+                    self.watch_manager.add_watch(path, path_mask, rec=True, auto_add=True, quiet=True)
+
+    def start(self):
+        """
+        Report initial status and start watching
+        """
+        self.check()
+        self.notifier.start()
+
+    def stop(self):
+        """
+        Stop watching
+        """
+        with self.lock:
+            self.stopped = True
+            if self.recheck_timer:
+                self.recheck_timer.cancel()
+                self.recheck_timer = None
+        if self.notifier.is_alive():
+            self.notifier.stop()
+
+    def check(self):
+        """
+        Read card status and call back if presence changed
+        """
+        with self.check_lock:
+            online = bool(read_status(self.status_path))
+            if online != self.online:
+                self.online = online
+                self.callback(online)
+
+    def process_event(self, event):
+        """
+        Inotify event handler
+        """
+        self.check()
+        with self.lock:
+            self.generation += 1
+            self.schedule_recheck(0, self.generation)
+
+    def schedule_recheck(self, n, generation):
+        """
+        Schedule the nth recheck after an event (lock held)
+        """
+        if self.recheck_timer:
+            self.recheck_timer.cancel()
+            self.recheck_timer = None
+        if self.stopped or n >= len(RECHECK_DELAYS):
+            return
+        delay = RECHECK_DELAYS[n] - (RECHECK_DELAYS[n - 1] if n else 0)
+        self.recheck_timer = Timer(delay, self.recheck, args=[n, generation])
+        self.recheck_timer.daemon = True
+        self.recheck_timer.start()
+
+    def recheck(self, n, generation):
+        """
+        Recheck timer callback
+        """
+        if generation != self.generation:
+            return
+        self.check()
+        with self.lock:
+            if generation == self.generation:
+                self.schedule_recheck(n + 1, generation)
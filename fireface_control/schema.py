@@ -0,0 +1,599 @@
+"""
+Compiled parameter schema: parameters, mappings and lookup tables of a card model
+as plain data, built once and cached on disk.
+"""
+
+import os
+import json
+import hashlib
+import logging
+
+from . import __version__
+from .mixmatrix import MixMatrix
+
+logger = logging.getLogger(__name__)
+
+CACHE_FOLDER = '~/.config/fireface-control/schema/'
+
+EQ_BANDS = ['low', 'middle', 'high']
+DEFAULT_EQ_FREQS = {'low':100, 'middle': 1000, 'high': 10000}
+DEFAULT_EQ_TYPES = {'low': 1, 'middle': 0, 'high': 1} # 0 = peak, 1 = shelf, 2 = cut
+# fx group of parameters, by attribute prefix
+FX_GROUPS = {'eq-': 'eq', 'hpf-': 'eq', 'dyn-': 'dyn', 'autolevel-': 'autolevel', 'echo-': 'echo', 'reverb-': 'reverb'}
+# modules the compiled schema depends on: this one, the mix matrix layout
+# and fireface.py (transform names referenced by mappings)
+SCHEMA_SOURCES = ['schema.py', 'mixmatrix.py', 'fireface.py']
+
+def card_spec(model):
+    """
+    Return card model's inputs, outputs and mic options
+    """
+    if model == '802':
+
+        inputs =  [(x, 'line', f'AN {x + 1}') for x in range(8)] + \
+                  [(x, 'mic', f'MIC {x + 1}') for x in range(4)] + \
+                  [(x, 'spdif', f'AES {x + 1}') for x in range(2)] + \
+                  [(x, 'adat', f'ADAT {x + 1}') for x in range(16)]
+
+        outputs = [(x, 'line', f'AN {x + 1}') for x in range(8)] + \
+                  [(x, 'hp', f'PH {x + 9}') for x in range(4)] + \
+                  [(x, 'spdif', f'AES {x + 1}') for x in range(2)] + \
+                  [(x, 'adat', f'ADAT {x + 1}') for x in range(16)]
+
+        mic_options = ['invert-phase', 'mic-instrument', 'mic-power']
+
+    else: # UCX (untested)
+
+        inputs = [(x, 'mic', f'MIC {x + 1}') for x in range(2)] + \
+                 [(x, 'line', f'AN {x + 1}') for x in range(6)] + \
+                 [(x, 'spdif', f'AES {x + 1}') for x in range(2)] + \
+                 [(x, 'adat', f'ADAT {x + 1}') for x in range(8)]
+
+        outputs = [(x, 'line', f'AN {x + 1}') for x in range(6)] + \
+                  [(x, 'hp', f'PH {x + 7}') for x in range(2)] + \
+                  [(x, 'spdif', f'AES {x + 1}') for x in range(2)] + \
+                  [(x, 'adat', f'ADAT {x + 1}') for x in range(8)]
+
+        mic_options = ['invert-phase', 'mic-power']
+
+    return inputs, outputs, mic_options
+
+def alsa_lookup(name, alsadata):
+    """
+    Build amixer style lookup string for a parameter's alsa element
+    """
+    name = alsadata['name'] if 'name' in alsadata else name
+    iface = alsadata['iface'] if 'iface' in alsadata else 'MIXER'
+    lookup = f'iface={iface},name="{name}"'
+
+    if 'index' in alsadata:
+        lookup += f',index={alsadata['index']}'
+
+    return lookup
+
+def eq_params(prefix):
+    """
+    Eq parameter names (without channel index)
+    """
+    params = []
+    for band in EQ_BANDS:
+        for p in ['type', 'freq', 'gain', 'quality']:
+            if band == 'middle' and p == 'type':
+                continue
+            params.append(f'{prefix}:eq-{band}-{p}')
+    return params
+
+def index_parameter(name):
+    """
+    Parse a parameter name into [kind, attribute, fx group, output index, input index]
+    (eg 'monitor:input-gain:2:5' -> ['monitor', 'input-gain', None, 2, 5])
+    """
+    parts = name.split(':')
+    kind = parts[0] if parts[0] in ['input', 'output', 'monitor', 'fx'] and len(parts) > 1 else None
+    attr = parts[1] if kind else name
+    out_index = in_index = None
+
+    if kind == 'monitor':
+        out_index, in_index = int(parts[2]), int(parts[3])
+    elif kind and len(parts) > 2 and parts[-1].isdigit():
+        if kind == 'input':
+            in_index = int(parts[-1])
+        else:
+            out_index = int(parts[-1])
+
+    fx = None
+    for prefix, group in FX_GROUPS.items():
+        if attr.startswith(prefix):
+            fx = group
+            break
+
+    return [kind, attr, fx, out_index, in_index]
+
+def schema_key(model):
+    """
+    Cache invalidation key: package version, card model and source of the modules
+    the schema is built from (see SCHEMA_SOURCES)
+    """
+    digest = hashlib.sha1()
+    folder = os.path.dirname(__file__)
+    for name in SCHEMA_SOURCES:
+        with open(os.path.join(folder, name), 'rb') as f:
+            digest.update(f.read())
+    return f'{__version__}:{model}:{digest.hexdigest()}'
+
+def compile_schema(model):
+    """
+    Build card model's schema:
+        - parameters: [name, types, default, metadata] in creation order
+          (alsa metadata holds the precomputed lookup string)
+        - mappings: {src, dest, transform[, inverse, condition]},
+          transforms are referenced by name (see FireFace.transforms)
+        - lookup tables used by FireFace (mix matrix, meters)
+        - osc parameters name index and reverse maps (channel index -> names)
+    """
+    inputs, outputs, mic_options = card_spec(model)
+
+    parameters = []
+    mappings = []
+    # parameter names by group (eg 'output:hide:line') to avoid scanning the whole parameter list
+    groups = {}
+
+    def add(name, types, default=None, group=None, **metadata):
+        if 'alsa' in metadata:
+            metadata['alsa']['lookup'] = alsa_lookup(name, metadata['alsa'])
+        parameters.append([name, types, default, metadata])
+        if group:
+            groups.setdefault(group, []).append(name)
+
+    def map(src, dest, transform, **options):
+        mappings.append({'src': src, 'dest': dest, 'transform': transform, **options})
+
+    """
+    Source mixers gain parameters (computed by the monitor mix matrix)
+    """
+    mix_matrix = MixMatrix(outputs, inputs)
+    # parameters feeding the mix matrix: {name: (attribute, out_index, in_index)}
+    mix_matrix_params = {}
+
+    for out_index, (out_nth_of_type, out_type, out_name) in enumerate(outputs):
+        for in_type in ['line', 'mic', 'spdif', 'adat']:
+            add(f'mixer:{in_type}-source-gain:{out_index}', 'i' * len([x for x in inputs if in_type in x]),
+                mix_matrix.element_gains(out_index, in_type),
+                alsa={'name': f'mixer:{in_type}-source-gain', 'index': out_index})
+
+    """
+    Create output controls
+    """
+    for out_index, (out_nth_of_type, out_type, out_name) in enumerate(outputs):
+
+        # read-only
+        add(f'output:hardware-name:{out_index}', 's', out_name, osc=True, skip_state=True)
+        add(f'output:type:{out_index}', 's', out_type, osc=True, skip_state=True)
+
+        # gui options
+        add(f'output:name:{out_index}', 's', '', osc=True)
+        add(f'output:color:{out_index}', 's', '', osc=True)
+        add(f'output:hide:{out_index}', 'i', 0, group=f'output:hide:{out_type}', osc=True, output_type=out_type)
+
+        # volume + mute
+        add(f'output:volume-db:{out_index}', 'f', 0, osc=True)
+        add(f'output:mute:{out_index}', 'i', 0, osc=True)
+        add(f'output:stereo:{out_index}', 'i', 0, osc=True, state_order=-10)
+
+        add(f'output:volume:{out_index}', 'i', 0)
+        map([f'output:volume-db:{out_index}', f'output:mute:{out_index}', f'output:hide:{out_index}'],
+            f'output:volume:{out_index}', 'output-volume')
+
+        # meter
+        add(f'output:meter:{out_index}', 'f', -138, group=f'output:meter:{out_type}', osc=True, output_type=out_type, skip_state=True)
+
+        # channel options
+        add(f'output:invert-phase:{out_index}', 'i', 0, osc=True)
+
+        # line options
+        if out_type == 'line':
+            add(f'output:line-level:{out_index}', 'i', 1, group='output:line-level', osc=True)
+
+        # fx sends
+        add(f'output:fx-return:{out_index}', 'f', -65, group=f'output:fx-return:{out_type}', osc=True, output_type=out_type)
+
+        # eq
+        add(f'output:eq-activate:{out_index}', 'i', 0, osc=True)
+        for band in EQ_BANDS:
+            add(f'output:eq-{band}-freq:{out_index}', 'i', DEFAULT_EQ_FREQS[band], osc=True)
+            add(f'output:eq-{band}-gain:{out_index}', 'i', 0, osc=True)
+            add(f'output:eq-{band}-quality:{out_index}', 'i', 10, osc=True)
+            if band != 'middle':
+                add(f'output:eq-{band}-type:{out_index}', 'i', DEFAULT_EQ_TYPES[band], osc=True)
+
+        add(f'output:hpf-activate:{out_index}', 'i', 0, osc=True)
+        add(f'output:hpf-activate-conditionnal:{out_index}', 'i', 0, osc=True)
+        add(f'output:hpf-cut-off:{out_index}', 'i', 20, osc=True)
+        add(f'output:hpf-roll-off:{out_index}', 'i', 0, osc=True)
+
+        # only activate hpf when eq is activated
+        map([f'output:eq-activate:{out_index}', f'output:hpf-activate-conditionnal:{out_index}'],
+            f'output:hpf-activate:{out_index}', 'and')
+
+        # stream return connection matrix (default: straight routing from stream sources)
+        add(f'output:stream-return-matrix:{out_index}', 'i' * len(outputs), [0] * (out_index) + [1] + [0] * (len(outputs) - out_index - 1), osc=True)
+        # global volume for stream return
+        add(f'output:stream-return:{out_index}', 'f', 0, osc=True)
+        # alsa stream source
+        add(f'mixer:stream-source-gain:{out_index}', 'i' * len(outputs), alsa={'name': 'mixer:stream-source-gain', 'index': out_index})
+        # stream source mapping
+        map([f'output:stream-return:{out_index}', f'output:stream-return-matrix:{out_index}'],
+            f'mixer:stream-source-gain:{out_index}', 'stream-source')
+
+        # monitor return: global dimmer for monitor mix
+        add(f'output:monitor-return:{out_index}', 'f', 0, osc=True)
+
+        # dynamics
+        add(f'output:dyn-activate:{out_index}', 'i', 0, osc=True)
+        add(f'output:dyn-attack:{out_index}', 'i', 10, osc=True)
+        add(f'output:dyn-release:{out_index}', 'i', 300, osc=True)
+        add(f'output:dyn-gain:{out_index}', 'i', 0, osc=True)
+        add(f'output:dyn-compressor-threshold:{out_index}', 'i', -300, osc=True)
+        add(f'output:dyn-expander-threshold:{out_index}', 'i', -600, osc=True)
+        add(f'output:dyn-compressor-ratio:{out_index}', 'i', 10, osc=True)
+        add(f'output:dyn-expander-ratio:{out_index}', 'i', 10, osc=True)
+
+        add(f'output:autolevel-activate:{out_index}', 'i', 0, osc=True)
+        add(f'output:autolevel-max-gain:{out_index}', 'i', 0, osc=True)
+        add(f'output:autolevel-head-room:{out_index}', 'i', 30, osc=True)
+        add(f'output:autolevel-rise-time:{out_index}', 'i', 1, osc=True)
+
+    # map single output params to array params for alsa
+    output_alsa_params = [
+        'output:volume', 'output:invert-phase', 'output:eq-activate', 'output:hpf-activate', 'output:hpf-cut-off', 'output:hpf-roll-off',
+        'output:dyn-activate',  'output:dyn-attack',  'output:dyn-release',  'output:dyn-gain',
+        'output:dyn-compressor-threshold',  'output:dyn-expander-threshold',  'output:dyn-compressor-ratio',  'output:dyn-expander-ratio',
+        'output:autolevel-activate', 'output:autolevel-max-gain', 'output:autolevel-head-room', 'output:autolevel-rise-time'
+        ] + eq_params('output')
+
+    for param in output_alsa_params:
+        add(param, 'i' * len(outputs), alsa={})
+        map([f'{param}:{out_index}' for out_index in range(len(outputs))], param, 'array')
+
+    # line option arrays
+    add('output:line-level', 'i' * len(groups['output:line-level']), alsa={})
+    map(groups['output:line-level'], 'output:line-level', 'array')
+
+    meter_sources = []
+
+    for out_type in ['line', 'hp', 'spdif', 'adat']:
+        # fx return arrays
+        add(f'fx:{out_type}-output-volume', 'i' * len(groups[f'output:fx-return:{out_type}']), alsa={})
+        map(groups[f'output:fx-return:{out_type}'], f'fx:{out_type}-output-volume', 'array-x10')
+
+        # meters visibility
+        add(f'output:{out_type}-meters-visible', 'i', 1)
+        map(groups[f'output:hide:{out_type}'], f'output:{out_type}-meters-visible', 'visible')
+
+        # meters value
+        add(f'meter:{out_type}-output', 'i' * len(groups[f'output:meter:{out_type}']), alsa={'iface': 'CARD'}, skip_state=True)
+        meter_sources.append([f'output:{out_type}-meters-visible', f'meter:{out_type}-output', groups[f'output:meter:{out_type}']])
+
+    """
+    Input options, eq & dyn
+    """
+    for in_index, (in_nth_of_type, in_type, in_name) in enumerate(inputs):
+
+        # read-only
+        add(f'input:hardware-name:{in_index}', 's', in_name, osc=True, skip_state=True)
+        add(f'input:type:{in_index}', 's', in_type, osc=True, skip_state=True)
+
+        # gui options
+        add(f'input:name:{in_index}', 's', '', osc=True)
+        add(f'input:color:{in_index}', 's', '', osc=True)
+        add(f'input:hide:{in_index}', 'i', 0, group=f'input:hide:{in_type}', osc=True, input_type=in_type)
+
+        # meter
+        add(f'input:meter:{in_index}', 'f', -138, group=f'input:meter:{in_type}', osc=True, input_type=in_type, skip_state=True)
+
+        # line options
+        if in_type == 'line':
+            add(f'input:line-level:{in_index}', 'i', 0, group='input:line-level', osc=True)
+
+        # mic options
+        if in_type == 'mic':
+            for option in mic_options:
+                add(f'input:{option}:{in_index}', 'i', 0, group=f'input:{option}', osc=True, input_type=in_type)
+
+            # prevent mic inst + mic power state (also protected at driver level)
+            if model == '802':
+                map(f'input:mic-instrument:{in_index}', f'input:mic-power:{in_index}', 'not',
+                    condition=f'input:mic-instrument:{in_index}')
+                map(f'input:mic-power:{in_index}', f'input:mic-instrument:{in_index}', 'not',
+                    condition=f'input:mic-power:{in_index}')
+
+        # fx send
+        add(f'input:fx-send:{in_index}', 'f', -65, group=f'input:fx-send:{in_type}', osc=True, input_type=in_type)
+
+        # eq
+        add(f'input:eq-activate:{in_index}', 'i', 0, osc=True)
+        for band in EQ_BANDS:
+            add(f'input:eq-{band}-freq:{in_index}', 'i', DEFAULT_EQ_FREQS[band], osc=True)
+            add(f'input:eq-{band}-gain:{in_index}', 'i', 0, osc=True)
+            add(f'input:eq-{band}-quality:{in_index}', 'i', 10, osc=True)
+            if band != 'middle':
+                add(f'input:eq-{band}-type:{in_index}', 'i', DEFAULT_EQ_TYPES[band], osc=True)
+
+        add(f'input:hpf-activate:{in_index}', 'i', 0)
+        add(f'input:hpf-activate-conditionnal:{in_index}', 'i', 0, osc=True)
+        add(f'input:hpf-cut-off:{in_index}', 'i', 20, osc=True)
+        add(f'input:hpf-roll-off:{in_index}', 'i', 0, osc=True)
+
+        # only activate hpf when eq is activated
+        map([f'input:eq-activate:{in_index}', f'input:hpf-activate-conditionnal:{in_index}'],
+            f'input:hpf-activate:{in_index}', 'and')
+
+        # dynamics
+        add(f'input:dyn-activate:{in_index}', 'i', 0, osc=True)
+        add(f'input:dyn-attack:{in_index}', 'i', 10, osc=True)
+        add(f'input:dyn-release:{in_index}', 'i', 300, osc=True)
+        add(f'input:dyn-gain:{in_index}', 'i', 0, osc=True)
+        add(f'input:dyn-compressor-threshold:{in_index}', 'i', -300, osc=True)
+        add(f'input:dyn-expander-threshold:{in_index}', 'i', -600, osc=True)
+        add(f'input:dyn-compressor-ratio:{in_index}', 'i', 10, osc=True)
+        add(f'input:dyn-expander-ratio:{in_index}', 'i', 10, osc=True)
+
+        add(f'input:autolevel-activate:{in_index}', 'i', 0, osc=True)
+        add(f'input:autolevel-max-gain:{in_index}', 'i', 0, osc=True)
+        add(f'input:autolevel-head-room:{in_index}', 'i', 30, osc=True)
+        add(f'input:autolevel-rise-time:{in_index}', 'i', 1, osc=True)
+
+    # map single input params to array params for alsa
+    input_alsa_params = [
+        'input:eq-activate', 'input:hpf-activate', 'input:hpf-cut-off', 'input:hpf-roll-off',
+        'input:dyn-activate',  'input:dyn-attack',  'input:dyn-release',  'input:dyn-gain',
+        'input:dyn-compressor-threshold',  'input:dyn-expander-threshold',  'input:dyn-compressor-ratio',  'input:dyn-expander-ratio',
+        'input:autolevel-activate', 'input:autolevel-max-gain', 'input:autolevel-head-room', 'input:autolevel-rise-time'
+    ] + eq_params('input')
+
+    for param in input_alsa_params:
+        add(param, 'i' * len(inputs), alsa={})
+        map([f'{param}:{in_index}' for in_index in range(len(inputs))], param, 'array')
+
+    # line options arrays
+    add('input:line-level', 'i' * len(groups['input:line-level']), alsa={})
+    map(groups['input:line-level'], 'input:line-level', 'array')
+
+    # mic options arrays
+    for option in mic_options:
+        add(f'input:{option}', 'i' * len(groups[f'input:{option}']), alsa={})
+        map(groups[f'input:{option}'], f'input:{option}', 'array')
+
+    for in_type in ['line', 'mic', 'spdif', 'adat']:
+        # fx sends arrays
+        add(f'fx:{in_type}-source-gain', 'i' * len(groups[f'input:fx-send:{in_type}']), alsa={})
+        map(groups[f'input:fx-send:{in_type}'], f'fx:{in_type}-source-gain', 'array-x10')
+
+        # meters visibility
+        add(f'input:{in_type}-meters-visible', 'i', 1)
+        map(groups[f'input:hide:{in_type}'], f'input:{in_type}-meters-visible', 'visible')
+
+        # meters value
+        add(f'meter:{in_type}-input', 'i' * len(groups[f'input:meter:{in_type}']), alsa={'iface': 'CARD'}, skip_state=True)
+        meter_sources.append([f'input:{in_type}-meters-visible', f'meter:{in_type}-input', groups[f'input:meter:{in_type}']])
+
+    """
+    Meters
+    """
+    add('metering', 'i', 0, alsa={}, osc=True)
+
+    """
+    Monitor mixers
+    """
+    for out_index, (out_nth_of_type, out_type, out_name) in enumerate(outputs):
+
+        stereo_index = int(out_index / 2) * 2
+
+        # create gain, mute and pan controls for every input,
+        # the mix matrix turns them into mixer source gains
+        for in_index in range(len(inputs)):
+
+            add(f'monitor:input-gain:{out_index}:{in_index}', 'f', -65, osc=True)
+            add(f'monitor:input-pan:{out_index}:{in_index}', 'f', 0.5, osc=True)
+            add(f'monitor:input-mute:{out_index}:{in_index}', 'i', 0, osc=True)
+
+            mix_matrix_params[f'monitor:input-gain:{out_index}:{in_index}'] = ('gain', out_index, in_index)
+            mix_matrix_params[f'monitor:input-pan:{out_index}:{in_index}'] = ('pan', out_index, in_index)
+            mix_matrix_params[f'monitor:input-mute:{out_index}:{in_index}'] = ('mute', out_index, in_index)
+
+        mix_matrix_params[f'output:monitor-return:{out_index}'] = ('monitor_return', out_index, None)
+
+        if out_index % 2 == 0:
+            # first channel of every stereo pair
+
+            mix_matrix_params[f'output:stereo:{out_index}'] = ('stereo', out_index, None)
+
+            linked_params = [
+                'output:hide', 'output:volume-db', 'output:mute', 'output:name', 'output:color',
+                'output:eq-activate', 'output:hpf-activate-conditionnal', 'output:hpf-cut-off', 'output:hpf-roll-off',
+                'output:dyn-activate',  'output:dyn-attack',  'output:dyn-release',  'output:dyn-gain',
+                'output:dyn-compressor-threshold',  'output:dyn-expander-threshold',  'output:dyn-compressor-ratio', 'output:dyn-expander-ratio',
+                'output:stream-return', 'output:monitor-return', 'output:fx-return'] + eq_params('output')
+
+            if out_type == 'line':
+                linked_params.append('output:line-level')
+
+            # link outputs
+            for param in linked_params:
+                map(f'{param}:{out_index}', f'{param}:{out_index + 1}', 'identity',
+                    condition=f'output:stereo:{stereo_index}')
+
+            map(f'output:stereo:{out_index}', f'output:stereo:{out_index + 1}', 'identity', inverse='identity')
+
+            add(f'output:pan:{out_index}', 'f', 0.5, osc=True, state_order=-9)
+
+    for in_index in range(len(inputs)):
+        mix_matrix_params[f'input:hide:{in_index}'] = ('input_hide', None, in_index)
+
+    """
+    Stereo outputs
+    """
+    n_stereo_pairs = int(len(outputs) / 2)
+    # dsp stereo link, needed for stereo fx
+    add('output:stereo-link', 'i' * n_stereo_pairs, alsa={}, state_order=-2)
+    map([f'output:stereo:{index}' for index in range(0, len(outputs), 2)], 'output:stereo-link', 'array')
+
+    add('output:stereo-balance', 'i' * n_stereo_pairs, [0] * n_stereo_pairs, alsa={}, state_order=-1)
+    map([f'output:pan:{index}' for index in range(0, len(outputs), 2)], 'output:stereo-balance', 'balance')
+
+    """
+    FX (reverb & echo)
+    """
+    add('fx:echo-activate', 'i', 0, osc=True, alsa={})
+    add('fx:echo-delay', 'i', 10, alsa={})
+    add('fx:echo-feedback', 'i', 0, osc=True, alsa={})
+    add('fx:echo-lpf-freq', 'i', 0, osc=True, alsa={})
+    add('fx:echo-stereo-width', 'i', 100, osc=True, alsa={})
+    add('fx:echo-type', 'i', 0, osc=True, alsa={})
+    add('fx:echo-volume', 'i', 0, alsa={})
+
+    add('fx:echo-volume-db', 'i', 0, osc=True)
+    add('fx:echo-delay-s', 'f', 0.1, osc=True)
+
+    map('fx:echo-volume-db', 'fx:echo-volume', 'x10')
+    map('fx:echo-delay-s', 'fx:echo-delay', 'x100')
+
+    add('fx:reverb-activate', 'i', 0, osc=True, alsa={})
+    add('fx:reverb-attack', 'i', 100, osc=True, alsa={})
+    add('fx:reverb-hold', 'i', 300, osc=True, alsa={})
+    add('fx:reverb-release', 'i', 250, osc=True, alsa={})
+    add('fx:reverb-type', 'i', 0, osc=True, alsa={})
+    add('fx:reverb-room-scale', 'i', 100, osc=True, alsa={})
+    add('fx:reverb-smooth', 'i', 100, osc=True, alsa={})
+    add('fx:reverb-stereo-width', 'i', 100, osc=True, alsa={})
+    add('fx:reverb-time', 'i', 10, osc=True, alsa={})
+    add('fx:reverb-volume', 'i', 0, osc=True, alsa={})
+    add('fx:reverb-damping', 'i', 20000, osc=True, alsa={})
+    add('fx:reverb-post-lpf-freq', 'i', 20000, osc=True, alsa={})
+    add('fx:reverb-pre-delay', 'i', 0, osc=True, alsa={})
+    add('fx:reverb-pre-hpf-freq', 'i', 0, osc=True, alsa={})
+
+    add('fx:reverb-volume-db', 'i', 0, osc=True)
+    add('fx:reverb-time-s', 'f', 1, osc=True)
+
+    map('fx:reverb-volume-db', 'fx:reverb-volume', 'x10')
+    map('fx:reverb-time-s', 'fx:reverb-time', 'x10')
+
+    """
+    Clock and Sync parameters
+    """
+    # Read-only parameters (alsa param + skip_state meta = read-only)
+    add('active-clock-rate', 'i', 2, alsa={'iface': 'CARD'}, osc=True, skip_state=True, poll=True)
+    add('active-clock-source', 'i', 0, alsa={'iface': 'CARD'}, osc=True, skip_state=True, poll=True)
+
+    for name in ['external-source-lock', 'external-source-rate', 'external-source-sync']:
+
+        for i in range(4):
+            add(f'{name}:{i}', 'i', 0, osc=True, skip_state=True)
+
+        add(name, 'iiii', [0] * 4, alsa={'iface': 'CARD'}, skip_state=True, poll=True)
+        map(name, [f'{name}:{i}' for i in range(4)], 'identity')
+
+    # Writable parameters
+    add('primary-clock-source', 'i', 0, alsa={'iface': 'CARD'}, osc=True)
+    add('optical-output-signal', 'i', 0, alsa={'iface': 'CARD'}, osc=True)
+    add('spdif-input-interface', 'i', 0, alsa={'iface': 'CARD'}, osc=True)
+    add('spdif-output-format', 'i', 1, alsa={'iface': 'CARD'}, osc=True)
+    add('word-clock-single-speed', 'i', 0, alsa={'iface': 'CARD'}, osc=True)
+
+    """
+    Other settings
+    """
+    add('effect-on-input', 'i', 0, alsa={}, osc=True)
+
+    """
+    Channel selection
+    """
+    add('input:select', 'i', 0, osc=True, state_order=10)
+    add('output:select', 'i', 0, osc=True, state_order=10)
+
+    """
+    Gui constants
+    """
+    add('inputs', 'i', len(inputs), osc=True, skip_state=True, state_order=-2)
+    add('outputs', 'i', len(outputs), osc=True, skip_state=True, state_order=-2)
+
+    """
+    Misc gui options
+    """
+    add('show-eq', 'i', 1, osc=True)
+    add('show-dyn', 'i', 1, osc=True)
+    add('show-fx', 'i', 1, osc=True)
+    add('show-hw', 'i', 1, osc=True)
+
+    add('state-slots', 's', '', osc=True, skip_state=True)
+    add('current-state', 's', '', osc=True, skip_state=True)
+
+    add('gui-clients', 'i', 0, skip_state=True)
+
+    """
+    Osc parameters name index
+    """
+    index = {}
+    # reverse maps: channel index -> parameter names
+    channels = {
+        'input': [[] for x in inputs],
+        'output': [[] for x in outputs],
+        'monitor': [[] for x in outputs]
+    }
+    fx_params = {'echo': [], 'reverb': []}
+
+    for name, types, default, metadata in parameters:
+        if 'osc' not in metadata:
+            continue
+        index[name] = kind, attr, fx, out_index, in_index = index_parameter(name)
+        if kind == 'input' and in_index is not None:
+            channels['input'][in_index].append(name)
+        elif kind in ['output', 'monitor'] and out_index is not None:
+            channels[kind][out_index].append(name)
+        elif kind == 'fx' and fx in fx_params:
+            fx_params[fx].append(name)
+
+    return {
+        'key': schema_key(model),
+        'model': model,
+        'inputs': inputs,
+        'outputs': outputs,
+        'mic_options': mic_options,
+        'parameters': parameters,
+        'mappings': mappings,
+        'mix_matrix_params': mix_matrix_params,
+        'meter_sources': meter_sources,
+        'index': index,
+        'channels': channels,
+        'fx_params': fx_params,
+    }
+
+def load_schema(model, folder=CACHE_FOLDER):
+    """
+    Load card model's schema from cache, compile and cache it if missing or outdated
+    """
+    folder = os.path.expanduser(folder)
+    path = os.path.join(folder, f'{model}.json')
+    key = schema_key(model)
+
+    try:
+        with open(path) as f:
+            schema = json.load(f)
+        if schema['key'] == key:
+            return schema
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # json turns tuples into lists, compile through the same format as the cached version
+    schema = json.loads(json.dumps(compile_schema(model)))
+
+    try:
+        os.makedirs(folder, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(schema, f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        logger.warning(f'could not write schema cache {path}: {e}')
+
+    return schema
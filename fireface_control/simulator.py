@@ -0,0 +1,338 @@
+"""
+Hardware-free Fireface simulator, stands in for the interface, snd-fireface-ctl-service
+and procfs/devfs so that the whole application can run without a card
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from subprocess import Popen
+from threading import Lock, Thread, Timer
+from queue import Queue
+from array import array
+from time import monotonic, sleep
+from math import sin, pi
+
+from .schema import load_schema
+from .alsabackend import parse_lookup, normalize_values, fit_values
+from .meters import METER_FULL_SCALE
+
+# snd-fireface-ctl-service takes some time to take over the interface
+SERVICE_STARTUP_DELAY = 0.5
+# stand-in process for snd-fireface-ctl-service (exits on SIGINT)
+SERVICE_COMMAND = [sys.executable, '-c', 'import signal; signal.pause()']
+
+class Simulator():
+    """
+    Simulated Fireface interface:
+        - control elements of the card model (built from the parameter schema),
+          accepting writes and serving reads like snd-fireface-ctl-service does
+        - synthetic meter signals (slow sines, one phase per channel)
+        - fake procfs and devfs directories (to be used by AlsaMixer and CardPresence),
+          plug() / unplug() create and remove the card's status file and device node
+        - optional latency per element write / read (slow device)
+        - a stand-in process for snd-fireface-ctl-service, so that it can be supervised
+          (and crashed) like the real one
+
+    Element values are only reachable while the card is plugged and the service is running.
+    """
+
+    def __init__(self, model='802', root=None, card_number=0, write_latency=0, read_latency=0):
+
+        self.model = model
+        self.card_number = card_number
+        self.write_latency = write_latency
+        self.read_latency = read_latency
+
+        self.root = root or tempfile.mkdtemp(prefix='fireface-simulator-')
+        self.procfs = os.path.join(self.root, 'proc', 'asound')
+        self.devfs = os.path.join(self.root, 'dev', 'snd')
+        self.status_path = os.path.join(self.procfs, f'Fireface{model}', 'firewire', 'status')
+        os.makedirs(os.path.dirname(self.status_path), exist_ok=True)
+        os.makedirs(self.devfs, exist_ok=True)
+
+        self.lock = Lock()
+        self.plugged = False
+        self.service_ready = False
+        self.service_timer = None
+        self.service_process = None
+        self.stats = {'writes': 0, 'reads': 0, 'events': 0}
+        # called with (key, values) after each write (eg to measure latencies)
+        self.write_callback = None
+
+        # element tables: {(iface, name, index): values}
+        self.elements = {}
+        self.meters = {}
+        for name, types, default, metadata in load_schema(model)['parameters']:
+            if 'alsa' not in metadata:
+                continue
+            key = parse_lookup(metadata['alsa']['lookup'])
+            count = len(types)
+            if key[1].startswith('meter:'):
+                self.meters[key] = count
+            if default is None:
+                default = 0
+            if type(default) not in (list, tuple):
+                default = [default] * count
+            self.elements[key] = normalize_values(default)[:count]
+
+        # event subscribers: {backend: keys}
+        self.subscribers = {}
+        self.events = Queue()
+        Thread(target=self.dispatch_events, daemon=True).start()
+
+        self.start_time = monotonic()
+
+    def plug(self):
+        """
+        Connect the interface: create status file and device node
+        """
+        with self.lock:
+            if self.plugged:
+                return
+            self.plugged = True
+        with open(os.path.join(self.procfs, 'cards'), 'w') as f:
+            f.write(f' {self.card_number} [Fireface{self.model}    ]: Fireface{self.model} - Fireface{self.model}\n')
+        with open(os.path.join(self.devfs, f'controlC{self.card_number}'), 'w') as f:
+            pass
+        with open(self.status_path, 'w') as f:
+            f.write(f'Fireface{self.model} (simulated)\n')
+
+    def unplug(self):
+        """
+        Disconnect the interface: remove status file and device node, the service dies with it
+        """
+        with self.lock:
+            if not self.plugged:
+                return
+            self.plugged = False
+        self.stop_service()
+        self.crash_service()
+        for path in [self.status_path, os.path.join(self.devfs, f'controlC{self.card_number}'), os.path.join(self.procfs, 'cards')]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def toggle(self):
+        """
+        Plug / unplug the interface
+        """
+        if self.plugged:
+            self.unplug()
+        else:
+            self.plug()
+
+    def start_service(self, card_number):
+        """
+        Start simulated snd-fireface-ctl-service, ready after a short delay
+        """
+        if str(card_number) != str(self.card_number):
+            raise OSError(f'no such card: {card_number}')
+        self.stop_service()
+        self.service_timer = Timer(SERVICE_STARTUP_DELAY, self.service_started)
+        self.service_timer.daemon = True
+        self.service_timer.start()
+
+    def spawn_service(self, card_number):
+        """
+        Start simulated snd-fireface-ctl-service and its stand-in process, return the process
+        """
+        self.start_service(card_number)
+        self.service_process = Popen(SERVICE_COMMAND)
+        return self.service_process
+
+    def crash_service(self):
+        """
+        Kill the stand-in process (the service is not ready anymore once its exit is noticed)
+        """
+        if self.service_process and self.service_process.poll() is None:
+            self.service_process.kill()
+
+    def service_started(self):
+
+        with self.lock:
+            self.service_ready = self.plugged
+
+    def stop_service(self):
+        """
+        Stop simulated snd-fireface-ctl-service
+        """
+        if self.service_timer:
+            self.service_timer.cancel()
+            self.service_timer = None
+        with self.lock:
+            self.service_ready = False
+
+    @property
+    def online(self):
+        return self.plugged and self.service_ready
+
+    def backend(self):
+        """
+        Create an alsa backend connected to the simulator
+        """
+        return SimulatorBackend(self)
+
+    def meter_values(self, key):
+        """
+        Synthetic meter signal: level between -80dB and -6dB
+        """
+        t = monotonic() - self.start_time
+        values = []
+        for i in range(self.meters[key]):
+            db = -43 + 37 * sin(2 * pi * (0.1 + i * 0.013) * t + i)
+            values.append(int(METER_FULL_SCALE * 10 ** (db / 20)))
+        return values
+
+    def read(self, key):
+        """
+        Read element values ([] if the element doesn't exist or the device is offline)
+        """
+        if self.read_latency:
+            sleep(self.read_latency)
+        with self.lock:
+            if not self.online or key not in self.elements:
+                return []
+            self.stats['reads'] += 1
+            if key in self.meters:
+                return self.meter_values(key)
+            return list(self.elements[key])
+
+    def write(self, key, values):
+        """
+        Write element values, subscribers are notified if they changed
+        """
+        if self.write_latency:
+            sleep(self.write_latency)
+        with self.lock:
+            if not self.online or key not in self.elements:
+                return
+            self.stats['writes'] += 1
+            current = self.elements[key]
+            values = normalize_values(values)[:len(current)]
+            values = values + current[len(values):]
+            changed = values != current
+            self.elements[key] = values
+        if self.write_callback:
+            self.write_callback(key, values)
+        if changed:
+            self.events.put(key)
+
+    def external_write(self, lookup, value):
+        """
+        Simulate a change made on the device side (eg clock source)
+        """
+        self.write(parse_lookup(lookup), value)
+
+    def subscribe(self, backend, keys):
+
+        with self.lock:
+            self.subscribers[backend] = set(keys)
+
+    def unsubscribe(self, backend):
+
+        with self.lock:
+            self.subscribers.pop(backend, None)
+
+    def dispatch_events(self):
+        """
+        Event thread: report changed elements to subscribed backends
+        """
+        while True:
+            key = self.events.get()
+            with self.lock:
+                subscribers = [b for b, keys in self.subscribers.items() if key in keys]
+            for backend in subscribers:
+                self.stats['events'] += 1
+                backend.event_callback(key)
+
+    def cleanup(self):
+        """
+        Remove fake procfs and devfs
+        """
+        self.unplug()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class SimulatorBackend():
+    """
+    Alsa backend connected to a Simulator
+    """
+
+    name = 'simulator'
+
+    def __init__(self, simulator):
+
+        self.simulator = simulator
+        self.opened = False
+        self.event_callback = None
+        self.lookups = {}
+
+    def open(self):
+        """
+        Fails until the service is ready
+        """
+        if not self.simulator.online:
+            raise OSError('simulated snd-fireface-ctl-service is not ready')
+        self.opened = True
+
+    def close(self):
+
+        self.opened = False
+        self.simulator.unsubscribe(self)
+
+    def listen(self, lookups, callback):
+        """
+        Subscribe to element value changes
+        """
+        self.event_callback = callback
+        self.simulator.subscribe(self, [self.key(lookup) for lookup in lookups])
+
+    def key(self, lookup):
+        """
+        Get element key from lookup string (cached)
+        """
+        if lookup not in self.lookups:
+            self.lookups[lookup] = parse_lookup(lookup)
+        return self.lookups[lookup]
+
+    def set(self, lookup, value):
+        """
+        Write values to an element
+        """
+        if self.opened:
+            self.simulator.write(self.key(lookup), value)
+
+    def get(self, lookup):
+        """
+        Read values from an element
+        """
+        if not self.opened:
+            return []
+        return self.simulator.read(self.key(lookup))
+
+    def get_many(self, lookups, counts=None):
+        """
+        Read values from multiple elements, returns a contiguous integer buffer
+        (counts: expected number of values per element, missing values are zeros)
+        """
+        buffer = array('i')
+        # offline (service stopped): empty buffer, like a closed device
+        if self.opened and self.simulator.online:
+            for i, lookup in enumerate(lookups):
+                buffer.extend(fit_values(self.simulator.read(self.key(lookup)), lookup, counts[i] if counts else None))
+        return buffer
+
+    def contents(self):
+        """
+        Read all elements: {(iface, name, index): values}
+        """
+        contents = {}
+        if self.opened:
+            for key in list(self.simulator.elements):
+                values = self.simulator.read(key)
+                if values:
+                    contents[key] = values
+        return contents
@@ -0,0 +1,160 @@
+"""
+Runtime statistics: counters and duration histograms updated on hot paths,
+cheap enough to be left enabled (dict increments, power of two histogram buckets)
+"""
+
+from time import perf_counter, monotonic
+from contextlib import contextmanager
+
+class Histogram():
+    """
+    Duration histogram with power of two buckets:
+    bucket n holds durations in [2^(n-1), 2^n) microseconds
+    """
+
+    __slots__ = ['count', 'total', 'max', 'buckets']
+
+    def __init__(self):
+
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * 32
+
+    def observe(self, seconds):
+
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), 31)] += 1
+
+    def percentile(self, p):
+        """
+        Approximate percentile in ms (upper bound of the bucket that holds it)
+        """
+        rank = p / 100 * self.count
+        seen = 0
+        for n, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << n) / 1000, self.max * 1000)
+        return 0
+
+    def snapshot(self):
+
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0,
+            'p50_ms': round(self.percentile(50), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(self.max * 1000, 3)
+        }
+
+class Stats():
+    """
+    Statistics registry:
+        - counters (rates are computed between snapshots)
+        - duration histograms
+        - sources: callables returning dicts of statistics kept by other objects
+
+    Updates are not locked: concurrent increments may rarely be lost.
+    """
+
+    def __init__(self):
+
+        self.start_time = monotonic()
+        self.counters = {}
+        self.histograms = {}
+        self.sources = {}
+        self.last_snapshot = (self.start_time, {})
+
+    def count(self, name, n=1):
+        """
+        Increment counter
+        """
+        try:
+            self.counters[name] += n
+        except KeyError:
+            self.counters[name] = n
+
+    def observe(self, name, seconds):
+        """
+        Add duration to histogram
+        """
+        try:
+            self.histograms[name].observe(seconds)
+        except KeyError:
+            self.histograms[name] = Histogram()
+            self.histograms[name].observe(seconds)
+
+    @contextmanager
+    def timed(self, name):
+        """
+        Measure the duration of a block
+        """
+        t = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - t)
+
+    @contextmanager
+    def lock(self, lock, name='engine-lock'):
+        """
+        Acquire lock, measure wait and hold times
+        """
+        t = perf_counter()
+        with lock:
+            acquired = perf_counter()
+            self.observe(f'{name}.wait', acquired - t)
+            try:
+                yield
+            finally:
+                self.observe(f'{name}.hold', perf_counter() - acquired)
+
+    def register(self, name, source):
+        """
+        Add statistics source (callable returning a dict)
+        """
+        self.sources[name] = source
+
+    def snapshot(self):
+        """
+        All statistics, counter rates are computed since the previous snapshot
+        """
+        now = monotonic()
+        counters = dict(self.counters)
+        last_time, last_counters = self.last_snapshot
+        elapsed = max(now - last_time, 1e-6)
+        self.last_snapshot = (now, counters)
+
+        data = {
+            'uptime': round(now - self.start_time, 3),
+            'counters': counters,
+            'rates': {name: round((value - last_counters.get(name, 0)) / elapsed, 3) for name, value in counters.items()},
+            'histograms': {name: h.snapshot() for name, h in self.histograms.items()},
+        }
+        for name, source in self.sources.items():
+            data[name] = source()
+
+        return data
+
+    def summary(self):
+        """
+        One line summary of a snapshot: counter rates and histograms' p99
+        """
+        data = self.snapshot()
+        rates = ', '.join([f'{name} {rate:g}/s' for name, rate in sorted(data['rates'].items()) if rate])
+        durations = ', '.join([f'{name} p99 {h['p99_ms']:g}ms' for name, h in sorted(data['histograms'].items())])
+        return f'rates: {rates or "-"} | durations: {durations or "-"}'
+
+    def reset(self):
+        """
+        Clear counters and histograms
+        """
+        self.counters = {}
+        self.histograms = {}
+        self.last_snapshot = (monotonic(), {})
+
+stats = Stats()
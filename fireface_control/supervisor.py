@@ -0,0 +1,191 @@
+"""
+Service process supervision (snd-fireface-ctl-service)
+"""
+
+import logging
+from threading import RLock, Thread, Timer
+from time import monotonic
+from signal import SIGINT
+
+# restart delay after an unexpected exit, doubled after each consecutive failure
+RESTART_DELAY = 0.25
+MAX_RESTART_DELAY = 30
+# a process that ran this long resets the restart delay (seconds)
+STABLE_TIME = 30
+
+class ServiceSupervisor():
+    """
+    Run a service process and restart it with exponential backoff when it exits unexpectedly.
+
+    Each process is waited for by a monitor thread blocked in waitpid() (no polling).
+    spawn() must return a Popen object, on_start() is called after each (re)start
+    and on_exit(returncode) after each unexpected exit (before the restart).
+    """
+
+    def __init__(self, name, spawn, on_start=None, on_exit=None, logger=None):
+
+        self.name = name
+        self.spawn = spawn
+        self.on_start = on_start
+        self.on_exit = on_exit
+        self.logger = logger or logging.getLogger(name)
+
+        self.lock = RLock()
+        self.process = None
+        self.running = False
+        self.restart_timer = None
+        self.failures = 0
+        self.start_time = 0
+        self.ready_pending = False
+
+        self.stats = {
+            'starts': 0,
+            'restarts': 0,
+            'exits': 0,
+            'spawn_errors': 0,
+            'last_exit_code': None,
+            'restart_delay': 0,
+            'time_to_ready_ms': None,
+            'max_time_to_ready_ms': 0
+        }
+
+    def start(self):
+        """
+        Start supervising (and start the process)
+        """
+        with self.lock:
+            self.running = True
+            self.failures = 0
+            self.cancel_restart()
+            if self.process:
+                return
+            started = self.spawn_process()
+
+        if started and self.on_start:
+            self.on_start()
+
+    def stop(self, terminate=True):
+        """
+        Stop supervising, send SIGINT to the process if terminate is True
+        (kill() / terminate() doesn't quit snd-fireface-ctl-service properly)
+        """
+        with self.lock:
+            self.running = False
+            self.cancel_restart()
+            process = self.process
+            self.process = None
+
+        if process and terminate:
+            process.send_signal(SIGINT)
+
+    def restart(self):
+        """
+        Stop the process, it will be restarted like after an unexpected exit
+        """
+        with self.lock:
+            process = self.process
+
+        if process:
+            process.send_signal(SIGINT)
+
+    def ready(self):
+        """
+        Report the service as ready: record time to ready since last start
+        """
+        with self.lock:
+            if not self.ready_pending:
+                return
+            self.ready_pending = False
+            elapsed = round((monotonic() - self.start_time) * 1000, 3)
+            self.stats['time_to_ready_ms'] = elapsed
+            self.stats['max_time_to_ready_ms'] = max(self.stats['max_time_to_ready_ms'], elapsed)
+
+        self.logger.info(f'{self.name} ready in {elapsed:g}ms')
+
+    def spawn_process(self):
+        """
+        Start the process and its monitor thread (lock held),
+        a restart is scheduled if it fails
+        """
+        try:
+            process = self.spawn()
+        except Exception as e:
+            self.stats['spawn_errors'] += 1
+            self.logger.warning(f'could not start {self.name} ({e})')
+            self.schedule_restart()
+            return False
+
+        self.process = process
+        self.start_time = monotonic()
+        self.ready_pending = True
+        self.stats['starts'] += 1
+        Thread(target=self.monitor, args=[process], name=f'{self.name}-monitor', daemon=True).start()
+        self.logger.info(f'{self.name} started (pid {process.pid})')
+
+        return True
+
+    def monitor(self, process):
+        """
+        Monitor thread: wait for the process to exit
+        """
+        returncode = process.wait()
+
+        with self.lock:
+            if process is not self.process:
+                # stopped by the supervisor
+                return
+            self.process = None
+            self.stats['exits'] += 1
+            self.stats['last_exit_code'] = returncode
+            if not self.running:
+                return
+            if monotonic() - self.start_time > STABLE_TIME:
+                self.failures = 0
+            self.logger.warning(f'{self.name} exited with code {returncode}')
+            self.schedule_restart()
+
+        if self.on_exit:
+            self.on_exit(returncode)
+
+    def schedule_restart(self):
+        """
+        Restart the process after a delay that doubles with each consecutive failure (lock held)
+        """
+        delay = min(RESTART_DELAY * 2 ** self.failures, MAX_RESTART_DELAY)
+        self.failures += 1
+        self.stats['restart_delay'] = delay
+        self.logger.info(f'restarting {self.name} in {delay:g}s')
+
+        self.restart_timer = Timer(delay, self.restart_process)
+        self.restart_timer.daemon = True
+        self.restart_timer.start()
+
+    def cancel_restart(self):
+
+        if self.restart_timer:
+            self.restart_timer.cancel()
+            self.restart_timer = None
+
+    def restart_process(self):
+        """
+        Restart timer callback
+        """
+        with self.lock:
+            self.restart_timer = None
+            if not self.running or self.process:
+                return
+            self.stats['restarts'] += 1
+            started = self.spawn_process()
+
+        if started and self.on_start:
+            self.on_start()
+
+    def snapshot(self):
+        """
+        Supervisor statistics
+        """
+        with self.lock:
+            data = dict(self.stats)
+            data['running'] = self.process is not None
+            data['uptime'] = round(monotonic() - self.start_time, 3) if self.process else 0
+        return data
@@ -0,0 +1,144 @@
+"""
+Control path tracing: timestamped spans recorded in a bounded ring buffer,
+dumped as chrome trace json (chrome://tracing, https://ui.perfetto.dev)
+"""
+
+import os
+import json
+import logging
+from time import perf_counter, strftime
+from threading import Thread, get_ident, enumerate as enumerate_threads
+from collections import deque
+
+TRACE_FOLDER = '~/.config/fireface-control/traces/'
+# maximum number of recorded events (oldest events are dropped)
+TRACE_BUFFER_SIZE = 200000
+
+logger = logging.getLogger('Trace')
+
+class Span():
+    """
+    Span context manager: records a complete event when the block exits
+    """
+
+    __slots__ = ['tracer', 'name', 'category', 'args', 'start']
+
+    def __init__(self, tracer, name, category, args):
+
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+
+        self.tracer.complete(self.name, self.category, self.start, perf_counter(), **self.args)
+
+class NullSpan():
+    """
+    Span returned when tracing is disabled
+    """
+
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+NULL_SPAN = NullSpan()
+
+class Tracer():
+    """
+    Trace recorder, does nothing but return NULL_SPAN from span() when disabled.
+    Call sites that already measure durations can check the enabled flag
+    and record complete events themselves.
+    """
+
+    def __init__(self, size=TRACE_BUFFER_SIZE):
+
+        self.enabled = False
+        self.events = deque(maxlen=size)
+        self.pid = os.getpid()
+
+    def start(self):
+        """
+        Start recording
+        """
+        self.enabled = True
+        logger.info(f'tracing enabled (last {self.events.maxlen} events are kept)')
+
+    def stop(self):
+        """
+        Stop recording (recorded events are kept until dumped)
+        """
+        self.enabled = False
+
+    def span(self, name, category='', /, **args):
+        """
+        Record the duration of a block
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category, args)
+
+    def complete(self, name, category, start, end, /, **args):
+        """
+        Record a complete event (start / end: perf_counter() times)
+        """
+        self.events.append((name, category, 'X', start, end - start, get_ident(), args))
+
+    def instant(self, name, category='', /, **args):
+        """
+        Record an instant event
+        """
+        if self.enabled:
+            self.events.append((name, category, 'i', perf_counter(), 0, get_ident(), args))
+
+    def chrome_trace(self):
+        """
+        Recorded events in chrome trace format
+        """
+        events = []
+        for name, category, phase, start, duration, tid, args in list(self.events):
+            event = {'name': name, 'cat': category, 'ph': phase, 'ts': round(start * 1e6, 3), 'pid': self.pid, 'tid': tid, 'args': args}
+            if phase == 'X':
+                event['dur'] = round(duration * 1e6, 3)
+            else:
+                event['s'] = 't'
+            events.append(event)
+
+        for thread in enumerate_threads():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': thread.ident, 'args': {'name': thread.name}})
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path=None):
+        """
+        Write recorded events to a json file, return its path
+        """
+        if path is None:
+            folder = os.path.expanduser(TRACE_FOLDER)
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f'trace-{strftime('%Y%m%d-%H%M%S')}.json')
+
+        data = self.chrome_trace()
+        with open(path, 'w') as f:
+            json.dump(data, f, default=str)
+
+        logger.info(f'{len(data['traceEvents'])} trace events written to {path}')
+        return path
+
+    def dump_async(self):
+        """
+        Dump from a separate thread (eg from a signal handler)
+        """
+        Thread(target=self.dump, daemon=True).start()
+
+tracer = Tracer()
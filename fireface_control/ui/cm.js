@@ -1,25 +1,106 @@
 var clients = {},
-    [mentat_host, mentat_port] = settings.read('send')[0].split(':')
+    // last journal sequence received by each client, frozen when its connection closes
+    // (messages queued afterwards are dropped if the client is destroyed)
+    sequences = {},
+    lost_clients = {},
+    [mentat_host, mentat_port] = settings.read('send')[0].split(':'),
+    meters = {layout: [], last: []}
 
 app.on('open', (data, client)=>{
     clients[client.id] = true
+    send(mentat_host, mentat_port, '/gui-client-open', client.id)
     send(mentat_host, mentat_port, '/gui-clients', Object.values(clients).length)
 })
 
 app.on('close', (data, client)=>{
     delete clients[client.id]
+    send(mentat_host, mentat_port, '/gui-client-close', client.id)
+    send(mentat_host, mentat_port, '/gui-clients', Object.values(clients).length)
+})
+
+app.on('destroyed', (data, client)=>{
+    // connection lost for too long: messages queued for this client are dropped
+    if (sequences[client.id] === undefined) return
+    lost_clients[client.id] = sequences[client.id]
+    delete sequences[client.id]
+    if (!clients[client.id]) return
+    delete clients[client.id]
+    send(mentat_host, mentat_port, '/gui-clients', Object.values(clients).length)
+})
+
+app.on('created', (data, client)=>{
+    // lost client reconnected without reloading: ask for the changes made
+    // after the last sequence it received
+    if (lost_clients[client.id] === undefined) return
+    var since = lost_clients[client.id]
+    delete lost_clients[client.id]
+    clients[client.id] = true
+    sequences[client.id] = since
+    send(mentat_host, mentat_port, '/_client/' + client.id + '/connect', since)
     send(mentat_host, mentat_port, '/gui-clients', Object.values(clients).length)
 })
 
 module.exports = {
 
+    oscInFilter: (data)=>{
+        var {address, args, host, port} = data
+
+        if (address.startsWith('/_client/')) {
+            // message for a single client: /_client/{client id}/{address}
+            var index = address.indexOf('/', 9),
+                id = address.slice(9, index)
+            if (address.slice(index) === '/journal-sequence') {
+                if (clients[id]) sequences[id] = args[0].value
+                return
+            }
+            if (clients[id]) receive(host, port, address.slice(index), ...args, {clientId: id})
+            return
+        }
+
+        if (address === '/journal-sequence') {
+            // last change sent to all connected clients (see OSC.client_resync)
+            for (var id in clients) sequences[id] = args[0].value
+            return
+        }
+
+        if (address === '/meter-layout') {
+            // meter widget ids, in meter frame order
+            meters.layout = args.map(a=>a.value)
+            meters.last = []
+            return
+        }
+
+        if (address === '/meter-frame') {
+            // unpack int16 meter values (dB * 10) and update changed meters with a single script
+            var blob = args[0].value,
+                view = new DataView(blob.buffer, blob.byteOffset, blob.byteLength),
+                script = ''
+
+            for (var i = 0; i < meters.layout.length && i * 2 < blob.byteLength; i++) {
+                var value = view.getInt16(i * 2, true)
+                if (value !== meters.last[i]) {
+                    meters.last[i] = value
+                    script += `set("${meters.layout[i]}",${value / 10},{sync:false,send:false});`
+                }
+            }
+
+            if (script) receive(host, port, '/SCRIPT', script)
+            return
+        }
+
+        return data
+    },
+
     oscOutFilter: (data)=>{
         var {address, args, host, port, clientId} = data
 
-        // manual client sync (default sync disabled to prevent state sync on connection)
-        for (var id in clients) {
-            if (id !== clientId) receive(host, port, address, ...args, {clientId: id})
-        }
+        // state push acknowledgement, not a widget value
+        if (address === '/state-rendered') return data
+
+        // messages are tagged with the client's id: selections are tracked per client
+        // and the server forwards values to the other clients that display them
+        // (default sync disabled to prevent state sync on connection)
+        data.address = '/_client/' + clientId + address
 
         return data
     },
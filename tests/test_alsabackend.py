@@ -0,0 +1,30 @@
+"""
+Alsa backend helpers
+"""
+
+import io
+
+from fireface_control.alsabackend import ControlEventReader, parse_lookup
+
+def test_parse_lookup():
+    assert parse_lookup('iface=MIXER,name="output:volume",index=2') == ('MIXER', 'output:volume', 2)
+    assert parse_lookup("numid=12,iface=CARD,name='meter:input'") == ('CARD', 'meter:input', 0)
+    assert parse_lookup('name="input:gain"') == ('MIXER', 'input:gain', 0)
+
+def test_control_event_reader():
+    stream = io.StringIO(
+        'Ready to listen...\n'
+        'Poll ok: 0\n'
+        "event value: numid=3,iface=MIXER,name='output:volume',index=1\n"
+        "event info: numid=3,iface=MIXER,name='output:volume',index=1\n"
+        "event value: numid=7,iface=CARD,name='input:gain'\n"
+        'Poll ok: 0\n'
+        "event value: numid=3,iface=MIXER,name='output:volume',index=1\n"
+    )
+    keys = []
+    reader = ControlEventReader(stream, keys.append)
+    reader.start()
+    reader.join(5)
+
+    assert not reader.is_alive()
+    assert keys == [('MIXER', 'output:volume', 1), ('CARD', 'input:gain', 0), ('MIXER', 'output:volume', 1)]
@@ -0,0 +1,119 @@
+"""
+AlsaMixer write queue, on a simulated card
+"""
+
+import sys
+import socket
+from threading import Thread, Lock
+from time import sleep, monotonic
+
+import pytest
+
+pytest.importorskip('mentat')
+
+TIMEOUT = 10
+THREADS = 4
+WRITES = 200
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def wait_until(predicate, timeout=TIMEOUT):
+    timeout = monotonic() + timeout
+    while not predicate():
+        if monotonic() > timeout:
+            return False
+        sleep(0.005)
+    return True
+
+def run_with_mixer(tmp_path, monkeypatch, test):
+    """
+    Start an engine with a simulated AlsaMixer and run test(alsamixer, simulator, writes)
+    once the card is online (engine runs in the main thread, like the application)
+    """
+    # application modules parse the command line when imported
+    monkeypatch.setattr(sys, 'argv', ['fireface-control'])
+    monkeypatch.setenv('HOME', str(tmp_path))
+    from mentat import Engine
+    from fireface_control.alsamixer import AlsaMixer
+    from fireface_control.simulator import Simulator
+
+    simulator = Simulator(root=str(tmp_path / 'root'))
+    writes = []
+    writes_lock = Lock()
+    def write_callback(key, values):
+        with writes_lock:
+            writes.append((key, values[0]))
+    simulator.write_callback = write_callback
+
+    engine = Engine('FirefaceControl', port=free_port(), folder=str(tmp_path / 'engine'))
+    alsamixer = AlsaMixer('AlsaMixer', simulator=simulator)
+    engine.add_module(alsamixer)
+
+    errors = []
+    def run():
+        try:
+            assert wait_until(lambda: alsamixer.get('card-online')), 'card not online'
+            test(alsamixer, simulator, writes)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            engine.stop()
+
+    engine.add_event_callback('started', lambda: Thread(target=run, daemon=True).start())
+    engine.start()
+
+    if errors:
+        raise errors[0]
+
+def test_write_coalescing(tmp_path, monkeypatch):
+
+    def test(alsamixer, simulator, writes):
+        from fireface_control.schema import load_schema
+        from fireface_control.alsabackend import parse_lookup
+
+        lookups = []
+        for name, types, default, metadata in load_schema(simulator.model)['parameters']:
+            lookup = metadata.get('alsa', {}).get('lookup')
+            if lookup and parse_lookup(lookup) in simulator.elements and parse_lookup(lookup) not in simulator.meters:
+                lookups.append(lookup)
+        lookups = lookups[:THREADS]
+        keys = [parse_lookup(lookup) for lookup in lookups]
+
+        # long enough for writers to outpace flushes on any machine
+        alsamixer.write_interval = 0.02
+
+        del writes[:]
+        submitted = alsamixer.alsa_write_stats()['submitted']
+
+        # one writer thread per element, plus a shared element written by all of them
+        def writer(lookup):
+            for value in range(1, WRITES + 1):
+                alsamixer.alsa_set(lookup, value)
+                alsamixer.alsa_set(lookups[0], value)
+
+        threads = [Thread(target=writer, args=[lookup]) for lookup in lookups[1:]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert wait_until(lambda: all(simulator.elements[key][0] == WRITES for key in keys))
+        assert alsamixer.alsa_write_stats()['submitted'] - submitted == 2 * WRITES * (THREADS - 1)
+
+        for key in keys[1:]:
+            values = [value for k, value in writes if k == key]
+            # latest value wins, in submission order
+            assert values[-1] == WRITES
+            assert values == sorted(values)
+            # writes to the same element are coalesced
+            assert len(values) < WRITES
+
+        # concurrent writers: the shared element still ends up with the last value written
+        assert [value for k, value in writes if k == keys[0]][-1] == WRITES
+
+    run_with_mixer(tmp_path, monkeypatch, test)
@@ -0,0 +1,79 @@
+"""
+Card presence detection on the simulator's fake procfs / devfs
+"""
+
+import os
+from threading import Condition
+from time import sleep
+
+import pytest
+
+from fireface_control.presence import CardPresence
+from fireface_control.simulator import Simulator
+
+TIMEOUT = 5
+
+@pytest.fixture
+def simulator(tmp_path, monkeypatch):
+    # keep the schema cache out of the user's home
+    monkeypatch.setenv('HOME', str(tmp_path))
+    simulator = Simulator(root=str(tmp_path / 'root'))
+    yield simulator
+    simulator.cleanup()
+
+@pytest.fixture
+def presence(simulator):
+    changes = []
+    changed = Condition()
+
+    def callback(online):
+        with changed:
+            changes.append(online)
+            changed.notify_all()
+
+    def wait_for(expected):
+        with changed:
+            return changed.wait_for(lambda: changes == expected, TIMEOUT)
+
+    presence = CardPresence(simulator.status_path, callback, watch=[simulator.devfs], watch_status=[simulator.procfs])
+    presence.wait_for = wait_for
+    yield presence
+    presence.stop()
+
+def test_initial_status(simulator, presence):
+    simulator.plug()
+    presence.start()
+    assert presence.wait_for([True])
+
+def test_plug_unplug(simulator, presence):
+    presence.start()
+    assert presence.wait_for([False])
+
+    simulator.plug()
+    assert presence.wait_for([False, True])
+
+    simulator.unplug()
+    assert presence.wait_for([False, True, False])
+
+    simulator.plug()
+    assert presence.wait_for([False, True, False, True])
+
+def test_device_writes_ignored(simulator, presence):
+    simulator.plug()
+    presence.start()
+    assert presence.wait_for([True])
+
+    # let the rechecks of the plug events run out
+    generation = presence.generation
+    sleep(0.2)
+    while presence.generation != generation:
+        generation = presence.generation
+        sleep(0.2)
+
+    # alsa clients opening / closing the control device
+    for i in range(10):
+        with open(os.path.join(simulator.devfs, f'controlC{simulator.card_number}'), 'w'):
+            pass
+    sleep(0.2)
+
+    assert presence.generation == generation